@@ -5,7 +5,7 @@ Batch transform coordinates between different coordinate reference systems.
 
 Author: HaritaHive Team
 Version: 2.0.0
-Dependencies: pyproj, pandas, numpy
+Dependencies: pyproj, pandas, numpy (pyarrow for fast CSV, Parquet and Feather I/O)
 
 Usage:
     python coordinate-transformer.py --input coordinates.csv --from EPSG:4326 --to EPSG:3857 --output transformed.csv
@@ -13,32 +13,72 @@ Usage:
 Features:
 - Batch coordinate transformation
 - Support for multiple coordinate reference systems
-- CSV input/output format
+- CSV, Parquet and Feather input/output formats
 - Error handling and validation
 """
 
+import numpy as np
 import pandas as pd
 import pyproj
 import argparse
+import importlib.util
 import sys
 from pathlib import Path
 
+# pandas' pyarrow CSV engine when pyarrow is installed
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+COORDINATE_COLUMNS = [('x', 'y'), ('longitude', 'latitude')]
+
+def read_coordinates(input_file):
+    """
+    Read a CSV, Parquet or Feather coordinate table.
+    
+    The CSV header is read first so the coordinate columns are parsed
+    directly as float64 instead of going through type inference.
+    """
+    suffix = Path(input_file).suffix.lower()
+    if suffix in ('.parquet', '.pq'):
+        df = pd.read_parquet(input_file)
+    elif suffix in ('.feather', '.arrow'):
+        df = pd.read_feather(input_file)
+    else:
+        header = pd.read_csv(input_file, nrows=0).columns
+        dtypes = {col: np.float64 for pair in COORDINATE_COLUMNS for col in pair if col in header}
+        return pd.read_csv(input_file, dtype=dtypes, engine=CSV_ENGINE)
+    
+    for pair in COORDINATE_COLUMNS:
+        for col in pair:
+            if col in df.columns:
+                df[col] = df[col].astype(np.float64)
+    return df
+
+def write_table(df, output_file):
+    """Write a table as CSV, Parquet or Feather depending on the file extension."""
+    suffix = Path(output_file).suffix.lower()
+    if suffix in ('.parquet', '.pq'):
+        df.to_parquet(output_file, index=False)
+    elif suffix in ('.feather', '.arrow'):
+        df.reset_index(drop=True).to_feather(output_file)
+    else:
+        df.to_csv(output_file, index=False)
+
 def transform_coordinates(input_file, source_crs, target_crs, output_file):
     """
     Transform coordinates from one CRS to another.
     
     Args:
-        input_file (str): Path to input CSV file with coordinates
+        input_file (str): Path to input CSV, Parquet or Feather file with coordinates
         source_crs (str): Source coordinate reference system (e.g., 'EPSG:4326')
         target_crs (str): Target coordinate reference system (e.g., 'EPSG:3857')
-        output_file (str): Path to output CSV file
+        output_file (str): Path to output CSV, Parquet or Feather file
     """
     
     print(f"Loading coordinates from: {input_file}")
     
     try:
         # Load coordinate data
-        df = pd.read_csv(input_file)
+        df = read_coordinates(input_file)
         
         # Validate required columns
         required_cols = ['x', 'y']  # or 'longitude', 'latitude'
@@ -56,15 +96,15 @@ def transform_coordinates(input_file, source_crs, target_crs, output_file):
         
         transformed_x, transformed_y = transformer.transform(df['x'].values, df['y'].values)
         
-        # Create output dataframe
-        result_df = df.copy()
-        result_df['transformed_x'] = transformed_x
-        result_df['transformed_y'] = transformed_y
-        result_df['source_crs'] = source_crs
-        result_df['target_crs'] = target_crs
+        # Add output columns in place (CRS columns as single-category categoricals)
+        codes = np.zeros(len(df), dtype=np.int8)
+        df['transformed_x'] = transformed_x
+        df['transformed_y'] = transformed_y
+        df['source_crs'] = pd.Categorical.from_codes(codes, [source_crs])
+        df['target_crs'] = pd.Categorical.from_codes(codes, [target_crs])
         
         # Save results
-        result_df.to_csv(output_file, index=False)
+        write_table(df, output_file)
         print(f"Transformed coordinates saved to: {output_file}")
         
     except Exception as e:
@@ -73,10 +113,10 @@ def transform_coordinates(input_file, source_crs, target_crs, output_file):
 
 def main():
     parser = argparse.ArgumentParser(description='Transform coordinates between CRS')
-    parser.add_argument('--input', required=True, help='Input CSV file with coordinates')
+    parser.add_argument('--input', required=True, help='Input CSV, Parquet or Feather file with coordinates')
     parser.add_argument('--from', dest='source_crs', required=True, help='Source CRS (e.g., EPSG:4326)')
     parser.add_argument('--to', dest='target_crs', required=True, help='Target CRS (e.g., EPSG:3857)')
-    parser.add_argument('--output', required=True, help='Output CSV file')
+    parser.add_argument('--output', required=True, help='Output CSV, Parquet or Feather file')
     
     args = parser.parse_args()
     
@@ -5,36 +5,808 @@ Advanced geostatistical interpolation using ordinary, universal, and indicator k
 
 License: MIT
 Author: HaritaHive Team
-Dependencies: pykrige, numpy, matplotlib, scikit-learn
+Dependencies: pykrige, numpy, scipy, matplotlib, scikit-learn (rasterio for GeoTIFF output)
 """
 
 import numpy as np
 import matplotlib.pyplot as plt
 from pykrige.ok import OrdinaryKriging
 from pykrige.uk import UniversalKriging
-from pykrige.ik import IndicatorKriging
+from pykrige import variogram_models
+from scipy.linalg import lu_factor, lu_solve
+from scipy.optimize import least_squares
+from scipy.sparse import coo_matrix, csr_matrix, diags
+from scipy.sparse.linalg import cg, splu
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
 from sklearn.metrics import mean_squared_error, r2_score
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import argparse
+import importlib.util
+import json
+import os
 import pandas as pd
 
+# pandas' pyarrow CSV engine when pyarrow is installed
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+try:
+    import rasterio
+    from rasterio.transform import from_origin
+    from rasterio.windows import Window
+except ImportError:
+    rasterio = None
+
+VARIOGRAM_FUNCTIONS = {
+    'linear': variogram_models.linear_variogram_model,
+    'power': variogram_models.power_variogram_model,
+    'gaussian': variogram_models.gaussian_variogram_model,
+    'spherical': variogram_models.spherical_variogram_model,
+    'exponential': variogram_models.exponential_variogram_model,
+}
+
+# Parameter names in pykrige's internal order
+VARIOGRAM_PARAMETER_NAMES = {
+    'linear': ('slope', 'nugget'),
+    'power': ('scale', 'exponent', 'nugget'),
+    'gaussian': ('psill', 'range', 'nugget'),
+    'spherical': ('psill', 'range', 'nugget'),
+    'exponential': ('psill', 'range', 'nugget'),
+}
+
+# Largest sample count for global leave-one-out (one dense (n+p)^2 float64 matrix, ~800 MB)
+LOO_MAX_SAMPLES = 10000
+
+def data_fingerprint(x, y, z):
+    """Sample count, bounds and value moments identifying the data a variogram was fitted on"""
+    return {
+        'n': int(len(z)),
+        'bounds': [float(np.min(x)), float(np.min(y)), float(np.max(x)), float(np.max(y))],
+        'z_mean': float(np.mean(z)),
+        'z_std': float(np.std(z))
+    }
+
+def fingerprints_match(a, b):
+    """True if two data fingerprints describe the same samples"""
+    if a is None or b is None or a['n'] != b['n']:
+        return False
+    return np.allclose(a['bounds'] + [a['z_mean'], a['z_std']],
+                       b['bounds'] + [b['z_mean'], b['z_std']], rtol=1e-9, atol=1e-12)
+
+class Variogram:
+    """Experimental variogram and fitted model, computed once and shared by all kriging runs"""
+    
+    def __init__(self, model, parameters, lags=(), semivariance=(), counts=(), fingerprint=None):
+        """
+        Args:
+            model: Variogram model name (see VARIOGRAM_FUNCTIONS)
+            parameters: Model parameters in pykrige order (see VARIOGRAM_PARAMETER_NAMES)
+            lags, semivariance, counts: Experimental variogram bins
+            fingerprint: data_fingerprint of the fitted samples (saved with to_json)
+        """
+        if model not in VARIOGRAM_FUNCTIONS:
+            raise ValueError(f"Unsupported variogram model: {model}")
+        self.model = model
+        self.parameters = [float(p) for p in parameters]
+        self.lags = np.asarray(lags, dtype=float)
+        self.semivariance = np.asarray(semivariance, dtype=float)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.fingerprint = fingerprint
+    
+    @property
+    def function(self):
+        return VARIOGRAM_FUNCTIONS[self.model]
+    
+    def __call__(self, distances):
+        return self.function(self.parameters, np.asarray(distances, dtype=float))
+    
+    def pykrige_parameters(self):
+        """Parameters as the dict accepted by pykrige's variogram_parameters"""
+        return dict(zip(VARIOGRAM_PARAMETER_NAMES[self.model], self.parameters))
+    
+    def pykrige_options(self):
+        """Keyword arguments making a pykrige model use this variogram without refitting"""
+        return {
+            'variogram_model': self.model,
+            'variogram_parameters': self.pykrige_parameters(),
+            'verbose': False
+        }
+    
+    @staticmethod
+    def experimental(x, y, z, n_lags=12, max_lag=None):
+        """
+        Binned semivariance of all sample pairs closer than max_lag
+        
+        Pairs come from a KD-tree search, so only pairs within max_lag are
+        generated (default: half the diagonal of the sample extent).
+        
+        Returns:
+            Mean lag distance, semivariance and pair count of each non-empty bin
+        """
+        xy = np.column_stack((x, y))
+        z = np.asarray(z, dtype=float)
+        if max_lag is None:
+            max_lag = 0.5 * np.linalg.norm(xy.max(axis=0) - xy.min(axis=0))
+        
+        pairs = cKDTree(xy).query_pairs(max_lag, output_type='ndarray')
+        distances = np.linalg.norm(xy[pairs[:, 0]] - xy[pairs[:, 1]], axis=1)
+        half_squares = 0.5 * (z[pairs[:, 0]] - z[pairs[:, 1]]) ** 2
+        
+        bins = np.minimum((distances * (n_lags / max_lag)).astype(np.intp), n_lags - 1)
+        counts = np.bincount(bins, minlength=n_lags)
+        filled = counts > 0
+        lags = np.bincount(bins, distances, n_lags)[filled] / counts[filled]
+        semivariance = np.bincount(bins, half_squares, n_lags)[filled] / counts[filled]
+        
+        return lags, semivariance, counts[filled]
+    
+    @classmethod
+    def fit(cls, x, y, z, model='spherical', n_lags=12, max_lag=None):
+        """Compute the experimental variogram and fit the model to it (robust least squares)"""
+        lags, semivariance, counts = cls.experimental(x, y, z, n_lags, max_lag)
+        if len(lags) < 2:
+            raise ValueError("Too few sample pairs to fit a variogram; increase max_lag")
+        
+        # Initial guess and bounds as used by pykrige's own fitting
+        s_min, s_max = semivariance.min(), semivariance.max()
+        if model == 'linear':
+            x0 = [(s_max - s_min) / max(lags[-1] - lags[0], 1e-12), s_min]
+            bounds = ([0.0, 0.0], [np.inf, s_max])
+        elif model == 'power':
+            x0 = [(s_max - s_min) / max(lags[-1] - lags[0], 1e-12), 1.1, s_min]
+            bounds = ([0.0, 0.001, 0.0], [np.inf, 1.999, s_max])
+        else:
+            x0 = [s_max - s_min, 0.25 * lags[-1], s_min]
+            bounds = ([0.0, 0.0, 0.0], [10.0 * s_max, lags[-1], s_max])
+        
+        function = VARIOGRAM_FUNCTIONS[model]
+        result = least_squares(
+            lambda params: function(params, lags) - semivariance,
+            np.clip(x0, bounds[0], bounds[1]), bounds=bounds, loss='soft_l1'
+        )
+        
+        return cls(model, result.x, lags, semivariance, counts)
+    
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'model': self.model,
+                'parameters': dict(zip(VARIOGRAM_PARAMETER_NAMES[self.model], self.parameters)),
+                'lags': self.lags.tolist(),
+                'semivariance': self.semivariance.tolist(),
+                'counts': self.counts.tolist(),
+                'data': self.fingerprint
+            }, f, indent=2)
+    
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        parameters = [data['parameters'][name] for name in VARIOGRAM_PARAMETER_NAMES[data['model']]]
+        return cls(data['model'], parameters, data['lags'], data['semivariance'], data['counts'],
+                   data.get('data'))
+
+def local_ordinary_kriging(xy, z, points, variogram_function, variogram_parameters,
+                           n_neighbors=16, tree=None, chunk_size=None, eps=1e-10, exclude=None):
+    """
+    Ordinary kriging from the k nearest samples of every prediction point
+    
+    Each point gets its own (k+1) x (k+1) kriging system. Systems are stacked
+    per chunk of points and solved together with np.linalg.solve, so the cost
+    is linear in the number of points and independent of the sample count.
+    
+    Args:
+        xy: (n, 2) sample coordinates
+        z: (n,) sample values
+        points: (m, 2) prediction coordinates
+        variogram_function, variogram_parameters: Fitted pykrige variogram
+        n_neighbors: Samples used per prediction point
+        tree: cKDTree over xy (built if not given)
+        chunk_size: Prediction points solved per batch (default: ~4M matrix entries)
+        exclude: Optional (m,) sample index left out of each point's neighborhood
+                 (leave-one-out prediction at the samples themselves)
+    
+    Returns:
+        Predictions and kriging variances, both of shape (m,)
+    """
+    tree = cKDTree(xy) if tree is None else tree
+    k = min(n_neighbors, len(z) - (exclude is not None))
+    diagonal = np.arange(k)
+    if chunk_size is None:
+        chunk_size = max(1, 4_000_000 // (k + 1) ** 2)
+    
+    z_pred = np.empty(len(points))
+    ss_pred = np.empty(len(points))
+    
+    for start in range(0, len(points), chunk_size):
+        block = points[start:start + chunk_size]
+        stop = start + len(block)
+        
+        if exclude is None:
+            distances, neighbors = tree.query(block, k=k, workers=-1)
+        else:
+            # One extra neighbor, then drop the excluded sample (or the farthest one)
+            distances, neighbors = tree.query(block, k=k + 1, workers=-1)
+            keep = neighbors != exclude[start:stop, None]
+            keep[keep.all(axis=1), -1] = False
+            distances, neighbors = distances[keep], neighbors[keep]
+        distances = distances.reshape(len(block), k)
+        neighbors = neighbors.reshape(len(block), k)
+        
+        # Stacked kriging matrices [[gamma_ij, 1], [1, 0]]
+        local_xy = xy[neighbors]
+        pair_distances = np.linalg.norm(local_xy[:, :, None, :] - local_xy[:, None, :, :], axis=-1)
+        a = np.ones((len(block), k + 1, k + 1))
+        a[:, :k, :k] = variogram_function(variogram_parameters, pair_distances)
+        a[:, diagonal, diagonal] = 0.0
+        a[:, k, k] = 0.0
+        
+        # Right-hand sides [gamma_i0, 1]; exact interpolation at sample locations
+        gamma = variogram_function(variogram_parameters, distances)
+        gamma[distances <= eps] = 0.0
+        b = np.ones((len(block), k + 1))
+        b[:, :k] = gamma
+        
+        try:
+            weights = np.linalg.solve(a, b[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            # Duplicate sample locations make some systems singular
+            weights = np.einsum('mij,mj->mi', np.linalg.pinv(a), b)
+        
+        z_pred[start:stop] = np.einsum('mi,mi->m', weights[:, :k], z[neighbors])
+        ss_pred[start:stop] = np.einsum('mi,mi->m', weights, b)
+    
+    return z_pred, ss_pred
+
+def leave_one_out_kriging(xy, z, variogram, drift=None, block_size=1024):
+    """
+    Leave-one-out kriging predictions from a single factorization of the kriging matrix
+    
+    For the symmetric kriging matrix A and right-hand side [z, 0], the
+    prediction error at sample i without refitting is (A^-1 z)_i / (A^-1)_ii
+    and the kriging variance is -1 / (A^-1)_ii (semivariogram form).
+    
+    A is built in row blocks and LU-factorized in place; diag(A^-1) is
+    collected from block solves, so memory stays at one (n+p)^2 matrix.
+    
+    Args:
+        xy: (n, 2) sample coordinates
+        z: (n,) sample values
+        variogram: Fitted Variogram
+        drift: Optional (n, p) drift columns (universal kriging); ordinary kriging if None
+        block_size: Rows (and unit vectors) handled per block
+    
+    Returns:
+        Leave-one-out predictions and kriging variances, both of shape (n,)
+    """
+    n = len(z)
+    constraints = np.ones((n, 1)) if drift is None else np.column_stack((np.ones(n), drift))
+    p = constraints.shape[1]
+    
+    a = np.zeros((n + p, n + p))
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        a[start:stop, :n] = variogram(cdist(xy[start:stop], xy))
+    a[np.arange(n), np.arange(n)] = 0.0
+    a[:n, n:] = constraints
+    a[n:, :n] = constraints.T
+    
+    lu = lu_factor(a, overwrite_a=True, check_finite=False)
+    weights = lu_solve(lu, np.concatenate((z, np.zeros(p))), check_finite=False)[:n]
+    
+    diagonal = np.empty(n)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        unit = np.zeros((n + p, stop - start))
+        unit[np.arange(start, stop), np.arange(stop - start)] = 1.0
+        diagonal[start:stop] = lu_solve(lu, unit, check_finite=False)[np.arange(start, stop), np.arange(stop - start)]
+    
+    return z - weights / diagonal, -1.0 / diagonal
+
+def correct_order_relations(cdf, axis=0):
+    """
+    Make indicator kriging CDFs valid: within [0, 1] and non-decreasing along axis
+    
+    Averages the upward (running maximum) and downward (running minimum from
+    the last threshold) corrections.
+    """
+    cdf = np.clip(cdf, 0.0, 1.0)
+    upward = np.maximum.accumulate(cdf, axis=axis)
+    downward = np.flip(np.minimum.accumulate(np.flip(cdf, axis=axis), axis=axis), axis=axis)
+    return 0.5 * (upward + downward)
+
+class IndicatorKrigingModel:
+    """
+    Ordinary indicator kriging of several thresholds sharing one variogram
+    
+    The kriging matrix is factorized once and the indicator right-hand sides
+    of all thresholds are solved together (dual form), so a prediction node
+    costs one row of semivariances and a small matrix product whatever the
+    number of thresholds. The kriging variance is shared by all thresholds.
+    """
+    
+    def __init__(self, x, y, z, thresholds, variogram, chunk_size=None, eps=1e-10):
+        self.xy = np.column_stack((x, y))
+        self.thresholds = np.sort(np.asarray(thresholds, dtype=float))
+        self.variogram = variogram
+        self.n_outputs = len(self.thresholds)
+        self.eps = eps
+        
+        n = len(z)
+        self.chunk_size = chunk_size or max(1, 4_000_000 // (n + 1))
+        
+        # Kriging matrix [[gamma_ij, 1], [1, 0]]
+        a = np.ones((n + 1, n + 1))
+        a[:n, :n] = variogram(cdist(self.xy, self.xy))
+        a[np.arange(n), np.arange(n)] = 0.0
+        a[n, n] = 0.0
+        self.lu = lu_factor(a, overwrite_a=True, check_finite=False)
+        
+        # Dual weights of every indicator column: A^-1 [I(z <= t); 0]
+        indicators = np.zeros((n + 1, self.n_outputs))
+        indicators[:n] = np.asarray(z)[:, None] <= self.thresholds
+        self.weights = lu_solve(self.lu, indicators, check_finite=False)
+    
+    def execute(self, style, xpoints, ypoints):
+        """
+        Predict the order-corrected CDF at 'grid' nodes or at 'points'
+        
+        Returns:
+            CDF of shape (n_thresholds, *nodes) and kriging variance of shape nodes
+        """
+        if style == 'grid':
+            mesh_x, mesh_y = np.meshgrid(xpoints, ypoints)
+        elif style == 'points':
+            mesh_x, mesh_y = np.asarray(xpoints, dtype=float), np.asarray(ypoints, dtype=float)
+        else:
+            raise ValueError("style must be 'grid' or 'points'")
+        
+        points = np.column_stack((mesh_x.ravel(), mesh_y.ravel()))
+        n = len(self.xy)
+        cdf = np.empty((self.n_outputs, len(points)))
+        ss_pred = np.empty(len(points))
+        
+        for start in range(0, len(points), self.chunk_size):
+            block = points[start:start + self.chunk_size]
+            stop = start + len(block)
+            
+            # Right-hand sides [gamma_i0, 1]; exact interpolation at sample locations
+            distances = cdist(block, self.xy)
+            b = np.ones((len(block), n + 1))
+            b[:, :n] = self.variogram(distances)
+            b[:, :n][distances <= self.eps] = 0.0
+            
+            cdf[:, start:stop] = (b @ self.weights).T
+            ss_pred[start:stop] = np.einsum('ij,ji->i', b, lu_solve(self.lu, b.T, check_finite=False))
+        
+        cdf = correct_order_relations(cdf)
+        return cdf.reshape((self.n_outputs,) + mesh_x.shape), ss_pred.reshape(mesh_x.shape)
+
+def _cross_validate_fold(method, variogram, train, test, n_neighbors):
+    """Fit a fold's model with fixed variogram parameters and predict its test points"""
+    x_train, y_train, z_train = train
+    x_test, y_test = test
+    options = variogram.pykrige_options()
+    
+    if method == 'ordinary':
+        model = OrdinaryKriging(x_train, y_train, z_train, **options)
+    elif method == 'universal':
+        model = UniversalKriging(
+            x_train, y_train, z_train,
+            drift_terms=['regional_linear'],
+            **options
+        )
+    else:
+        model = LocalKrigingModel(x_train, y_train, z_train,
+                                  variogram.function, variogram.parameters, n_neighbors)
+    
+    z_pred, _ = model.execute('points', x_test, y_test)
+    return np.asarray(z_pred)
+
+class LocalKrigingModel:
+    """Fitted local kriging model with the same execute() interface as pykrige"""
+    
+    def __init__(self, x, y, z, variogram_function, variogram_parameters, n_neighbors=16):
+        self.xy = np.column_stack((x, y))
+        self.z = np.asarray(z, dtype=float)
+        self.variogram_function = variogram_function
+        self.variogram_parameters = variogram_parameters
+        self.n_neighbors = n_neighbors
+        self.tree = cKDTree(self.xy)
+    
+    def execute(self, style, xpoints, ypoints):
+        """Predict at 'grid' nodes (shape (len(ypoints), len(xpoints))) or at 'points'"""
+        if style == 'grid':
+            mesh_x, mesh_y = np.meshgrid(xpoints, ypoints)
+        elif style == 'points':
+            mesh_x, mesh_y = np.asarray(xpoints, dtype=float), np.asarray(ypoints, dtype=float)
+        else:
+            raise ValueError("style must be 'grid' or 'points'")
+        
+        points = np.column_stack((mesh_x.ravel(), mesh_y.ravel()))
+        z_pred, ss_pred = local_ordinary_kriging(
+            self.xy, self.z, points,
+            self.variogram_function, self.variogram_parameters,
+            n_neighbors=self.n_neighbors, tree=self.tree
+        )
+        
+        return z_pred.reshape(mesh_x.shape), ss_pred.reshape(mesh_x.shape)
+
+def wendland_taper(distances, taper_range):
+    """Wendland taper (1 - h)^4 (1 + 4h), h = d / taper_range; positive definite in 2-D, zero beyond taper_range"""
+    h = np.minimum(np.asarray(distances, dtype=float) / taper_range, 1.0)
+    return (1.0 - h) ** 4 * (1.0 + 4.0 * h)
+
+class TaperedKrigingModel:
+    """
+    Ordinary kriging with a compactly supported (tapered) covariance
+    
+    The covariance sill - gamma(h) is multiplied by a Wendland taper, so the
+    kriging matrix only holds sample pairs closer than the taper range and is
+    stored and solved as a sparse matrix. The mean is the GLS estimate and
+    predictions use the dual form mu + c0' C^-1 (z - mu), so memory and time
+    grow near-linearly with the number of samples.
+    
+    The taper range trades accuracy for sparsity: a taper much shorter than
+    the variogram range discards most of the spatial correlation and is
+    clearly less accurate than dense or local kriging, mainly near the edges.
+    
+    Samples sharing a location are merged (mean value), since duplicate rows
+    would make the covariance matrix singular.
+    """
+    
+    def __init__(self, x, y, z, variogram, taper_range=None, solver='cg',
+                 with_variance=False, chunk_size=None, eps=1e-10,
+                 target_neighbors=300, max_neighbors=2000):
+        """
+        Args:
+            x, y, z: Sample coordinates and values
+            variogram: Fitted Variogram with a sill (gaussian, spherical or exponential)
+            taper_range: Taper support distance (default: the distance holding about
+                         target_neighbors samples at the mean sample density, at most
+                         the variogram range)
+            solver: 'cg' (Jacobi-preconditioned conjugate gradients, near-linear scaling) or
+                    'splu' (sparse LU; faster for moderate sizes and many variance solves)
+            with_variance: Also compute kriging variances (one sparse solve per prediction
+                           point); variances are NaN otherwise
+            chunk_size: Prediction points processed per batch
+            target_neighbors: Expected samples within the default taper range (a few
+                              hundred keep the accuracy close to dense kriging)
+            max_neighbors: Largest expected number of samples within the taper range
+                           (nonzeros per matrix row) before refusing to build the matrix
+        """
+        if variogram.model not in ('gaussian', 'spherical', 'exponential'):
+            raise ValueError("Covariance tapering needs a bounded variogram model "
+                             "(gaussian, spherical or exponential)")
+        if solver not in ('splu', 'cg'):
+            raise ValueError("solver must be 'splu' or 'cg'")
+        
+        psill, variogram_range, nugget = variogram.parameters
+        self.variogram = variogram
+        self.sill = psill + nugget
+        self.solver = solver
+        self.with_variance = with_variance
+        self.eps = eps
+        
+        xy = np.column_stack((x, y))
+        z = np.asarray(z, dtype=float)
+        self.xy, inverse = np.unique(xy, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        self.z = np.bincount(inverse, z) / np.bincount(inverse)
+        n = len(self.z)
+        if n < len(z):
+            print(f"Merged {len(z) - n} duplicate sample locations for tapered kriging")
+        self.tree = cKDTree(self.xy)
+        
+        # Expected samples within the taper range at the mean sample density
+        extent = self.xy.max(axis=0) - self.xy.min(axis=0)
+        density = n / max(np.prod(extent), 1e-12)
+        if taper_range is None:
+            taper_range = min(variogram_range, np.sqrt(target_neighbors / (np.pi * density)))
+        self.taper_range = taper_range
+        expected_neighbors = density * np.pi * taper_range ** 2
+        if expected_neighbors > max_neighbors:
+            raise ValueError(f"Taper range {taper_range:.4g} holds about {expected_neighbors:.0f} samples "
+                             f"per row (limit {max_neighbors}); the covariance matrix would be "
+                             "nearly dense, use a smaller taper range")
+        if chunk_size is None:
+            chunk_size = max(1, 4_000_000 // n) if with_variance else 65536
+        self.chunk_size = chunk_size
+        
+        # Sparse covariance matrix of all sample pairs within the taper range
+        pairs = self.tree.sparse_distance_matrix(self.tree, self.taper_range, output_type='ndarray')
+        pairs = pairs[pairs['i'] != pairs['j']]
+        diagonal = np.arange(n)
+        # Off-diagonal pairs are never coincident, so they take the covariance without the nugget
+        off_diagonal = (self.sill - self.variogram(pairs['v'])) * wendland_taper(pairs['v'], self.taper_range)
+        self.matrix = coo_matrix(
+            (np.concatenate((off_diagonal, np.full(n, self.sill))),
+             (np.concatenate((pairs['i'], diagonal)), np.concatenate((pairs['j'], diagonal)))),
+            shape=(n, n)
+        ).tocsc()
+        self._lu = None
+        
+        # GLS mean and dual weights
+        self.ones_weights = self._solve(np.ones(n))
+        self.ones_total = self.ones_weights.sum()
+        self.mean = self.ones_weights @ self.z / self.ones_total
+        self.weights = self._solve(self.z - self.mean)
+    
+    def covariance(self, distances):
+        """Tapered covariance sill - gamma(h) (sill at zero distance)"""
+        distances = np.asarray(distances, dtype=float)
+        cov = np.where(distances <= self.eps, self.sill, self.sill - self.variogram(distances))
+        return cov * wendland_taper(distances, self.taper_range)
+    
+    def _solve(self, rhs):
+        if self.solver == 'splu':
+            if self._lu is None:
+                self._lu = splu(self.matrix, permc_spec='MMD_AT_PLUS_A')
+            return self._lu.solve(rhs)
+        
+        preconditioner = diags(1.0 / self.matrix.diagonal())
+        columns = rhs.reshape(len(rhs), -1).T
+        solution = np.empty_like(columns)
+        for i, column in enumerate(columns):
+            solution[i], info = cg(self.matrix, column, rtol=1e-10, M=preconditioner)
+            if info > 0:
+                print(f"Warning: conjugate gradients did not converge in {info} iterations")
+        return solution.T.reshape(rhs.shape)
+    
+    def __getstate__(self):
+        # The sparse LU factorization is not picklable; workers refactorize on demand
+        state = self.__dict__.copy()
+        state['_lu'] = None
+        return state
+    
+    def execute(self, style, xpoints, ypoints):
+        """Predict at 'grid' nodes (shape (len(ypoints), len(xpoints))) or at 'points'"""
+        if style == 'grid':
+            mesh_x, mesh_y = np.meshgrid(xpoints, ypoints)
+        elif style == 'points':
+            mesh_x, mesh_y = np.asarray(xpoints, dtype=float), np.asarray(ypoints, dtype=float)
+        else:
+            raise ValueError("style must be 'grid' or 'points'")
+        
+        points = np.column_stack((mesh_x.ravel(), mesh_y.ravel()))
+        z_pred = np.empty(len(points))
+        ss_pred = np.full(len(points), np.nan)
+        
+        for start in range(0, len(points), self.chunk_size):
+            block = points[start:start + self.chunk_size]
+            stop = start + len(block)
+            
+            # Sparse prediction-to-sample covariances within the taper range
+            pairs = cKDTree(block).sparse_distance_matrix(self.tree, self.taper_range, output_type='ndarray')
+            c0 = csr_matrix((self.covariance(pairs['v']), (pairs['i'], pairs['j'])),
+                            shape=(len(block), len(self.z)))
+            
+            z_pred[start:stop] = self.mean + c0 @ self.weights
+            
+            if self.with_variance:
+                solved = self._solve(c0.T.toarray())
+                lagrange = 1.0 - c0 @ self.ones_weights
+                ss_pred[start:stop] = (self.sill - np.asarray(c0.multiply(solved.T).sum(axis=1)).ravel()
+                                       + lagrange ** 2 / self.ones_total)
+        
+        return z_pred.reshape(mesh_x.shape), ss_pred.reshape(mesh_x.shape)
+
+# Model held by each tile worker process (sent once through the pool initializer)
+_tile_model = None
+
+def _init_tile_worker(model):
+    global _tile_model
+    _tile_model = model
+
+def _predict_tile(rows, cols, tile_x, tile_y, model=None):
+    model = _tile_model if model is None else model
+    z_pred, ss_pred = model.execute('grid', tile_x, tile_y)
+    return rows, cols, np.asarray(z_pred), np.asarray(ss_pred)
+
+def iter_tiles(n_rows, n_cols, tile_size):
+    """Yield (rows, cols) slices covering an n_rows x n_cols grid"""
+    for row in range(0, n_rows, tile_size):
+        for col in range(0, n_cols, tile_size):
+            yield slice(row, min(row + tile_size, n_rows)), slice(col, min(col + tile_size, n_cols))
+
+def predict_grid(model, grid_x, grid_y, tile_size=256, workers=1, out=None, write_tile=None):
+    """
+    Evaluate a fitted kriging model on a grid, tile by tile
+    
+    Tiles are predicted in a process pool (the model is pickled once per
+    worker) and written as they complete, so only a few tiles are held in
+    memory at any time.
+    
+    Args:
+        model: Fitted model with execute('grid', x, y), e.g. OrdinaryKriging or LocalKrigingModel;
+               models with several outputs per node (n_outputs) return them first
+        grid_x, grid_y: Grid node coordinates
+        tile_size: Grid nodes per tile side
+        workers: Worker processes (1 predicts in this process)
+        out: (n_outputs + 1, len(grid_y), len(grid_x)) array receiving the predictions
+             and the variance as last band, e.g. from open_grid_memmap
+             (allocated in memory if not given)
+        write_tile: Optional callback(rows, cols, z_pred, ss_pred) used instead of out
+    
+    Returns:
+        out (None when write_tile is given)
+    """
+    grid_x = np.asarray(grid_x, dtype=float)
+    grid_y = np.asarray(grid_y, dtype=float)
+    
+    if write_tile is None:
+        if out is None:
+            out = np.empty((getattr(model, 'n_outputs', 1) + 1, len(grid_y), len(grid_x)))
+        
+        def write_tile(rows, cols, z_pred, ss_pred):
+            out[:-1, rows, cols] = z_pred.reshape((-1,) + ss_pred.shape)
+            out[-1, rows, cols] = ss_pred
+    
+    tiles = list(iter_tiles(len(grid_y), len(grid_x), tile_size))
+    workers = min(workers or os.cpu_count() or 1, len(tiles))
+    
+    if workers <= 1:
+        for rows, cols in tiles:
+            write_tile(*_predict_tile(rows, cols, grid_x[cols], grid_y[rows], model))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_tile_worker,
+                                 initargs=(model,)) as executor:
+            futures = [
+                executor.submit(_predict_tile, rows, cols, grid_x[cols], grid_y[rows])
+                for rows, cols in tiles
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                write_tile(*future.result())
+                if done % -(-len(tiles) // 10) == 0 or done == len(tiles):
+                    print(f"  {done}/{len(tiles)} tiles")
+    
+    if isinstance(out, np.memmap):
+        out.flush()
+    
+    return out
+
+def open_grid_memmap(path, grid_x, grid_y, dtype=np.float32, bands=2):
+    """Create a (bands, len(grid_y), len(grid_x)) .npy memmap for predict_grid output"""
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype,
+                                     shape=(bands, len(grid_y), len(grid_x)))
+
+def grid_transform(grid_x, grid_y):
+    """Affine transform of a north-up raster whose pixel centers are the grid nodes"""
+    dx = (grid_x[-1] - grid_x[0]) / max(len(grid_x) - 1, 1) or 1.0
+    dy = (grid_y[-1] - grid_y[0]) / max(len(grid_y) - 1, 1) or 1.0
+    return from_origin(grid_x[0] - dx / 2, grid_y[-1] + dy / 2, dx, dy)
+
+class GridFileWriter:
+    """
+    Streams predict_grid tiles into a north-up GeoTIFF (.tif) or NumPy (.npy) file
+    
+    Bands are the predictions followed by the kriging variance, stored as
+    float32. The file is created when the first tile arrives, so the band
+    count follows the model (e.g. one band per indicator threshold).
+    """
+    
+    def __init__(self, path, grid_x, grid_y, crs=None, block_size=256):
+        """
+        Args:
+            path: Output file (.tif/.tiff for GeoTIFF, .npy for a NumPy array)
+            grid_x, grid_y: Grid node coordinates (ascending)
+            crs: Coordinate reference system of the grid (GeoTIFF only)
+            block_size: GeoTIFF tile size (multiple of 16)
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension in ('.tif', '.tiff'):
+            if rasterio is None:
+                raise ImportError("rasterio is required for GeoTIFF output (pip install rasterio)")
+            self.driver = 'GTiff'
+        elif extension == '.npy':
+            self.driver = 'npy'
+        else:
+            raise ValueError(f"Unsupported grid output format: {path} (use .tif or .npy)")
+        
+        self.path = path
+        self.grid_x = np.asarray(grid_x, dtype=float)
+        self.grid_y = np.asarray(grid_y, dtype=float)
+        self.crs = crs
+        self.block_size = block_size
+        self.descriptions = None
+        self.dataset = None
+    
+    def _open(self, bands):
+        shape = (bands, len(self.grid_y), len(self.grid_x))
+        if self.driver == 'npy':
+            self.dataset = np.lib.format.open_memmap(self.path, mode='w+', dtype=np.float32, shape=shape)
+        else:
+            self.dataset = rasterio.open(
+                self.path, 'w', driver='GTiff',
+                width=shape[2], height=shape[1], count=bands, dtype='float32',
+                crs=self.crs, transform=grid_transform(self.grid_x, self.grid_y),
+                tiled=True, blockxsize=self.block_size, blockysize=self.block_size,
+                compress='deflate', predictor=3, BIGTIFF='IF_SAFER'
+            )
+    
+    def write_tile(self, rows, cols, z_pred, ss_pred):
+        """Write one tile in grid layout (row 0 = lowest y); rows are flipped north-up"""
+        ss_pred = np.asarray(ss_pred)
+        bands = np.concatenate((np.reshape(z_pred, (-1,) + ss_pred.shape), ss_pred[None]))
+        bands = bands[:, ::-1].astype(np.float32)
+        
+        if self.dataset is None:
+            self._open(len(bands))
+        
+        rows = range(len(self.grid_y))[rows]
+        cols = range(len(self.grid_x))[cols]
+        top = len(self.grid_y) - rows.stop
+        
+        if self.driver == 'npy':
+            self.dataset[:, top:top + len(rows), cols.start:cols.stop] = bands
+        else:
+            self.dataset.write(bands, window=Window(cols.start, top, len(cols), len(rows)))
+    
+    def write(self, z_pred, ss_pred):
+        """Write whole in-memory prediction and variance grids"""
+        self.write_tile(slice(None), slice(None), z_pred, ss_pred)
+    
+    def close(self):
+        if self.dataset is None:
+            return
+        if self.driver == 'npy':
+            self.dataset.flush()
+        else:
+            descriptions = self.descriptions or ['prediction']
+            for band, description in enumerate(list(descriptions) + ['variance'], 1):
+                if band <= self.dataset.count:
+                    self.dataset.set_band_description(band, description)
+            self.dataset.close()
+        self.dataset = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
 class KrigingInterpolator:
-    def __init__(self, x, y, z, variogram_model='spherical'):
+    def __init__(self, x, y, z, variogram_model='spherical', tile_size=256, workers=1, variogram=None):
         """
         Initialize kriging interpolator
         
         Args:
             x, y, z: Arrays of coordinates and values
             variogram_model: Variogram model ('linear', 'power', 'gaussian', 'spherical', 'exponential')
+            variogram: Previously fitted Variogram to reuse (fitted on first use if not given)
+            tile_size: Grid nodes per tile side for grid prediction
+            workers: Processes predicting tiles in parallel (None: all cores)
         """
         self.x = np.array(x)
         self.y = np.array(y)
         self.z = np.array(z)
-        self.variogram_model = variogram_model
+        self.variogram_model = variogram.model if variogram is not None else variogram_model
+        self.variogram = variogram
+        self.indicator_variogram = None
         self.ok_model = None
         self.uk_model = None
         self.ik_model = None
+        self.indicator_cdf = None
+        self.local_model = None
+        self.tapered_model = None
+        self.tile_size = tile_size
+        self.workers = workers
+    
+    def predict_grid(self, model, grid_x, grid_y, out=None):
+        """
+        Tiled (and parallel) grid prediction; returns prediction and variance grids
+        
+        out may be an array (see predict_grid) or a GridFileWriter; tiles are then
+        streamed to the file and (None, None) is returned.
+        """
+        if hasattr(out, 'write_tile'):
+            predict_grid(model, grid_x, grid_y, self.tile_size, self.workers, write_tile=out.write_tile)
+            return None, None
         
-    def ordinary_kriging(self, grid_x, grid_y, enable_plotting=False):
+        result = predict_grid(model, grid_x, grid_y, self.tile_size, self.workers, out)
+        return (result[:-1] if hasattr(model, 'n_outputs') else result[0]), result[-1]
+        
+    def ordinary_kriging(self, grid_x, grid_y, enable_plotting=False, out=None):
         """Perform ordinary kriging interpolation"""
         
         print(f"Performing ordinary kriging with {self.variogram_model} variogram...")
@@ -42,17 +814,80 @@ class KrigingInterpolator:
         # Create kriging model
         self.ok_model = OrdinaryKriging(
             self.x, self.y, self.z,
-            variogram_model=self.variogram_model,
-            verbose=False,
-            enable_plotting=enable_plotting
+            enable_plotting=enable_plotting,
+            **self.kriging_options()
         )
         
         # Perform interpolation
-        z_pred, ss_pred = self.ok_model.execute('grid', grid_x, grid_y)
+        return self.predict_grid(self.ok_model, grid_x, grid_y, out)
+    
+    def variogram_subset(self, max_samples=4000, seed=42):
+        """Sample indices used for variogram fitting (a random subset for large datasets)"""
+        if len(self.z) > max_samples:
+            return np.random.default_rng(seed).choice(len(self.z), max_samples, replace=False)
+        return slice(None)
+    
+    def fit_variogram(self, max_samples=4000, seed=42, n_lags=12, max_lag=None):
+        """Fit the variogram model on the samples (a random subset for large datasets)"""
+        
+        subset = self.variogram_subset(max_samples, seed)
+        
+        print(f"Fitting {self.variogram_model} variogram...")
+        self.variogram = Variogram.fit(
+            self.x[subset], self.y[subset], self.z[subset],
+            self.variogram_model, n_lags=n_lags, max_lag=max_lag
+        )
+        self.variogram.fingerprint = data_fingerprint(self.x, self.y, self.z)
+        print(f"  Parameters: {self.variogram.pykrige_parameters()}")
+        
+        return self.variogram
+    
+    def kriging_options(self, variogram=None):
+        """pykrige keyword arguments that reuse a fitted variogram instead of refitting"""
+        
+        if variogram is None:
+            if self.variogram is None:
+                self.fit_variogram()
+            variogram = self.variogram
         
-        return z_pred, ss_pred
+        return variogram.pykrige_options()
     
-    def universal_kriging(self, grid_x, grid_y, drift_terms=['regional_linear']):
+    def local_kriging(self, grid_x, grid_y, n_neighbors=16, out=None):
+        """Perform ordinary kriging using the nearest samples of each grid node"""
+        
+        print(f"Performing local kriging with {n_neighbors} neighbors "
+              f"and {self.variogram_model} variogram...")
+        
+        if self.variogram is None:
+            self.fit_variogram()
+        
+        self.local_model = LocalKrigingModel(
+            self.x, self.y, self.z,
+            self.variogram.function, self.variogram.parameters,
+            n_neighbors=n_neighbors
+        )
+        
+        return self.predict_grid(self.local_model, grid_x, grid_y, out)
+    
+    def tapered_kriging(self, grid_x, grid_y, taper_range=None, solver='cg',
+                        with_variance=False, out=None):
+        """Perform sparse ordinary kriging with a tapered covariance (large datasets)"""
+        
+        if self.variogram is None:
+            self.fit_variogram()
+        
+        self.tapered_model = TaperedKrigingModel(
+            self.x, self.y, self.z, self.variogram,
+            taper_range=taper_range, solver=solver, with_variance=with_variance
+        )
+        
+        print(f"Performing tapered kriging with {self.variogram_model} variogram "
+              f"(taper range {self.tapered_model.taper_range:.2f}, "
+              f"{self.tapered_model.matrix.nnz} nonzeros, {solver} solver)...")
+        
+        return self.predict_grid(self.tapered_model, grid_x, grid_y, out)
+    
+    def universal_kriging(self, grid_x, grid_y, drift_terms=['regional_linear'], out=None):
         """Perform universal kriging with trend"""
         
         print(f"Performing universal kriging with {drift_terms} drift...")
@@ -60,18 +895,23 @@ class KrigingInterpolator:
         # Create kriging model
         self.uk_model = UniversalKriging(
             self.x, self.y, self.z,
-            variogram_model=self.variogram_model,
             drift_terms=drift_terms,
-            verbose=False
+            **self.kriging_options()
         )
         
         # Perform interpolation
-        z_pred, ss_pred = self.uk_model.execute('grid', grid_x, grid_y)
-        
-        return z_pred, ss_pred
+        return self.predict_grid(self.uk_model, grid_x, grid_y, out)
     
-    def indicator_kriging(self, grid_x, grid_y, thresholds=None):
-        """Perform indicator kriging for categorical data"""
+    def indicator_kriging(self, grid_x, grid_y, thresholds=None, out=None):
+        """
+        Perform indicator kriging for categorical data
+        
+        All thresholds share the median indicator variogram and one kriging
+        system; the resulting CDF (self.indicator_cdf) is order-corrected per node.
+        
+        Returns:
+            Per-threshold probabilities P(z <= t), per-threshold variances, sorted thresholds
+        """
         
         if thresholds is None:
             # Auto-generate thresholds based on quantiles
@@ -80,129 +920,141 @@ class KrigingInterpolator:
                 np.percentile(self.z, 50),
                 np.percentile(self.z, 75)
             ]
+        thresholds = sorted(float(t) for t in thresholds)
         
         print(f"Performing indicator kriging with thresholds: {thresholds}")
         
-        # Create indicator variables
-        indicator_data = []
-        for threshold in thresholds:
-            indicators = (self.z <= threshold).astype(int)
-            indicator_data.append(indicators)
+        # Median indicator variogram, fitted once and shared by all thresholds
+        if self.indicator_variogram is None:
+            subset = self.variogram_subset()
+            self.indicator_variogram = Variogram.fit(
+                self.x[subset], self.y[subset], (self.z[subset] <= np.median(self.z)).astype(float),
+                self.variogram_model
+            )
         
-        # Perform kriging for each indicator
-        indicator_predictions = []
-        indicator_variances = []
+        self.ik_model = IndicatorKrigingModel(
+            self.x, self.y, self.z, thresholds, self.indicator_variogram
+        )
+        self.indicator_cdf, ss_pred = self.predict_grid(self.ik_model, grid_x, grid_y, out)
+        if self.indicator_cdf is None:
+            # Streamed to a file
+            return None, None, thresholds
         
-        for i, indicators in enumerate(indicator_data):
-            print(f"Processing indicator {i+1}/{len(indicator_data)}")
-            
-            ik_model = IndicatorKriging(
-                self.x, self.y, indicators,
-                variogram_model=self.variogram_model,
-                verbose=False
-            )
-            
-            z_pred, ss_pred = ik_model.execute('grid', grid_x, grid_y)
-            indicator_predictions.append(z_pred)
-            indicator_variances.append(ss_pred)
+        indicator_predictions = list(self.indicator_cdf)
+        indicator_variances = [ss_pred] * len(thresholds)
         
         return indicator_predictions, indicator_variances, thresholds
     
-    def cross_validate(self, method='ordinary', n_folds=5):
-        """Perform cross-validation"""
+    def cross_validate(self, method='ordinary', n_folds=5, leave_one_out=False, n_neighbors=16):
+        """
+        Perform cross-validation
+        
+        Args:
+            method: 'ordinary', 'universal' or 'local'
+            n_folds: Number of k-fold splits (folds run in parallel with self.workers)
+            leave_one_out: Closed-form leave-one-out instead of k-fold; uses one
+                           factorization of the global system, or each sample's
+                           neighborhood system for 'local' (and for 'ordinary' above
+                           LOO_MAX_SAMPLES; 'universal' falls back to k-fold there)
+            n_neighbors: Neighborhood size for 'local'
+        """
         
         from sklearn.model_selection import KFold
         
-        kf = KFold(n_splits=n_folds, shuffle=True, random_state=42)
+        if method not in ('ordinary', 'universal', 'local'):
+            raise ValueError("Method must be 'ordinary', 'universal' or 'local'")
         
-        predictions = []
-        observations = []
+        if self.variogram is None:
+            self.fit_variogram()
+        result = {}
         
-        for train_idx, test_idx in kf.split(self.x):
-            # Split data
-            x_train, x_test = self.x[train_idx], self.x[test_idx]
-            y_train, y_test = self.y[train_idx], self.y[test_idx]
-            z_train, z_test = self.z[train_idx], self.z[test_idx]
-            
-            # Fit model
+        if leave_one_out and method != 'local' and len(self.z) > LOO_MAX_SAMPLES:
+            # The global system would not fit in memory
             if method == 'ordinary':
-                model = OrdinaryKriging(
-                    x_train, y_train, z_train,
-                    variogram_model=self.variogram_model,
-                    verbose=False
-                )
-            elif method == 'universal':
-                model = UniversalKriging(
-                    x_train, y_train, z_train,
-                    variogram_model=self.variogram_model,
-                    drift_terms=['regional_linear'],
-                    verbose=False
+                print(f"{len(self.z)} samples exceed {LOO_MAX_SAMPLES} for global leave-one-out, "
+                      f"using local leave-one-out ({n_neighbors} neighbors)")
+                method = 'local'
+            else:
+                print(f"{len(self.z)} samples exceed {LOO_MAX_SAMPLES} for global leave-one-out, "
+                      f"using {n_folds}-fold cross-validation")
+                leave_one_out = False
+        
+        if leave_one_out:
+            xy = np.column_stack((self.x, self.y))
+            if method == 'local':
+                predictions, variances = local_ordinary_kriging(
+                    xy, self.z, xy,
+                    self.variogram.function, self.variogram.parameters,
+                    n_neighbors=n_neighbors, exclude=np.arange(len(self.z))
                 )
             else:
-                raise ValueError("Method must be 'ordinary' or 'universal'")
+                predictions, variances = leave_one_out_kriging(
+                    xy, self.z, self.variogram, drift=xy if method == 'universal' else None
+                )
+            observations = self.z
+            result['variances'] = variances
+        else:
+            kf = KFold(n_splits=n_folds, shuffle=True, random_state=42)
+            folds = list(kf.split(self.x))
             
-            # Predict test points
-            z_pred, _ = model.execute('points', x_test, y_test)
+            jobs = [
+                (method, self.variogram,
+                 (self.x[train_idx], self.y[train_idx], self.z[train_idx]),
+                 (self.x[test_idx], self.y[test_idx]),
+                 n_neighbors)
+                for train_idx, test_idx in folds
+            ]
+            workers = min(self.workers or os.cpu_count() or 1, len(jobs))
+            if workers <= 1:
+                fold_predictions = [_cross_validate_fold(*job) for job in jobs]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    fold_predictions = list(executor.map(_cross_validate_fold, *zip(*jobs)))
             
-            predictions.extend(z_pred)
-            observations.extend(z_test)
-        
-        predictions = np.array(predictions)
-        observations = np.array(observations)
+            predictions = np.concatenate(fold_predictions)
+            observations = np.concatenate([self.z[test_idx] for _, test_idx in folds])
         
         # Calculate metrics
         rmse = np.sqrt(mean_squared_error(observations, predictions))
         r2 = r2_score(observations, predictions)
         mae = np.mean(np.abs(observations - predictions))
         
-        print(f"Cross-validation results ({method} kriging):")
+        scheme = 'leave-one-out' if leave_one_out else f'{n_folds}-fold'
+        print(f"Cross-validation results ({method} kriging, {scheme}):")
         print(f"  RMSE: {rmse:.4f}")
         print(f"  R²: {r2:.4f}")
         print(f"  MAE: {mae:.4f}")
         
-        return {
+        result.update({
             'rmse': rmse,
             'r2': r2,
             'mae': mae,
             'predictions': predictions,
             'observations': observations
-        }
+        })
+        
+        return result
     
     def plot_variogram(self, model_type='ordinary'):
         """Plot experimental and model variograms"""
         
-        if model_type == 'ordinary' and self.ok_model:
-            model = self.ok_model
-        elif model_type == 'universal' and self.uk_model:
-            model = self.uk_model
-        else:
-            # Create temporary model for plotting
-            model = OrdinaryKriging(
-                self.x, self.y, self.z,
-                variogram_model=self.variogram_model,
-                verbose=False,
-                enable_plotting=True
-            )
+        if self.variogram is None:
+            self.fit_variogram()
         
         # Plot variogram
         plt.figure(figsize=(8, 6))
         
         # Get variogram parameters
-        lags = model.lags
-        semivariance = model.semivariance
+        lags = self.variogram.lags
+        semivariance = self.variogram.semivariance
         
         # Plot experimental variogram
         plt.scatter(lags, semivariance, c='blue', label='Experimental', alpha=0.7)
         
         # Plot model variogram
         lag_range = np.linspace(0, np.max(lags), 100)
-        if hasattr(model, 'variogram_function'):
-            model_variance = [
-                model.variogram_function([0, 0], [lag, 0]) 
-                for lag in lag_range
-            ]
-            plt.plot(lag_range, model_variance, 'r-', 
-                    label=f'{self.variogram_model.title()} Model')
+        plt.plot(lag_range, self.variogram(lag_range), 'r-', 
+                label=f'{self.variogram_model.title()} Model')
         
         plt.xlabel('Lag Distance')
         plt.ylabel('Semivariance')
@@ -296,24 +1148,54 @@ class KrigingInterpolator:
         }
 
 def load_data_from_csv(filepath, x_col='x', y_col='y', z_col='z'):
-    """Load spatial data from CSV file"""
-    df = pd.read_csv(filepath)
-    return df[x_col].values, df[y_col].values, df[z_col].values
+    """Load spatial data from a CSV, Parquet or Feather file (only the x, y, z columns, as float64)"""
+    columns = [x_col, y_col, z_col]
+    extension = os.path.splitext(filepath)[1].lower()
+    
+    if extension in ('.parquet', '.pq'):
+        df = pd.read_parquet(filepath, columns=columns)
+    elif extension in ('.feather', '.arrow'):
+        df = pd.read_feather(filepath, columns=columns)
+    else:
+        df = pd.read_csv(filepath, usecols=columns, dtype=dict.fromkeys(columns, np.float64),
+                         engine=CSV_ENGINE)
+    
+    return tuple(df[col].to_numpy(dtype=np.float64) for col in columns)
 
 def main():
     parser = argparse.ArgumentParser(description='Perform kriging interpolation')
-    parser.add_argument('--data', required=True, help='CSV file with x,y,z columns')
+    parser.add_argument('--data', required=True, help='CSV, Parquet or Feather file with x,y,z columns')
     parser.add_argument('--x-col', default='x', help='X coordinate column name')
     parser.add_argument('--y-col', default='y', help='Y coordinate column name')
     parser.add_argument('--z-col', default='z', help='Value column name')
-    parser.add_argument('--method', choices=['ordinary', 'universal', 'indicator', 'compare'], 
+    parser.add_argument('--method', choices=['ordinary', 'universal', 'local', 'tapered', 'indicator', 'compare'], 
                        default='ordinary', help='Kriging method')
     parser.add_argument('--variogram', default='spherical', 
                        choices=['linear', 'power', 'gaussian', 'spherical', 'exponential'],
                        help='Variogram model')
+    parser.add_argument('--variogram-file',
+                       help='JSON file caching the fitted variogram (reused if it matches --variogram and the data, refitted and written otherwise)')
     parser.add_argument('--grid-size', type=int, default=100, help='Grid size for interpolation')
-    parser.add_argument('--output', help='Output file for interpolated grid')
+    parser.add_argument('--neighbors', type=int, default=16,
+                       help='Nearest samples per grid node for local kriging')
+    parser.add_argument('--taper-range', type=float,
+                       help='Covariance taper distance for tapered kriging (default: sized for ~300 neighbours, '
+                            'at most the variogram range); shorter tapers are sparser but less accurate')
+    parser.add_argument('--solver', choices=['cg', 'splu'], default='cg',
+                       help='Sparse solver for tapered kriging')
+    parser.add_argument('--tapered-variance', action='store_true',
+                       help='Compute kriging variances for tapered kriging (one solve per grid node)')
+    parser.add_argument('--tile-size', type=int, default=256,
+                       help='Grid nodes per tile side for grid prediction')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Processes predicting tiles in parallel (0: all cores)')
+    parser.add_argument('--output',
+                       help='Output grid: GeoTIFF (.tif) or NumPy (.npy) with prediction and variance '
+                            'bands (north-up), or CSV text of the prediction for other extensions')
+    parser.add_argument('--crs', help='CRS of the input coordinates for GeoTIFF output (e.g. EPSG:32633)')
     parser.add_argument('--cross-validate', action='store_true', help='Perform cross-validation')
+    parser.add_argument('--loo', action='store_true',
+                       help='Use closed-form leave-one-out instead of k-fold cross-validation')
     parser.add_argument('--plot-variogram', action='store_true', help='Plot variogram')
     
     args = parser.parse_args()
@@ -327,39 +1209,87 @@ def main():
     print(f"Y range: {np.min(y):.2f} to {np.max(y):.2f}")
     print(f"Z range: {np.min(z):.2f} to {np.max(z):.2f}")
     
+    # Reuse a cached variogram fit when available
+    variogram = None
+    if args.variogram_file and os.path.exists(args.variogram_file):
+        variogram = Variogram.from_json(args.variogram_file)
+        if variogram.model != args.variogram:
+            print(f"{args.variogram_file} holds a {variogram.model} variogram, refitting {args.variogram}")
+            variogram = None
+        elif not fingerprints_match(variogram.fingerprint, data_fingerprint(x, y, z)):
+            print(f"{args.variogram_file} was fitted on different data, refitting")
+            variogram = None
+        else:
+            print(f"Loaded {variogram.model} variogram from {args.variogram_file}")
+    
     # Create interpolator
-    interpolator = KrigingInterpolator(x, y, z, args.variogram)
+    interpolator = KrigingInterpolator(x, y, z, args.variogram,
+                                       tile_size=args.tile_size, workers=args.workers or None,
+                                       variogram=variogram)
+    if args.variogram_file and variogram is None:
+        interpolator.fit_variogram().to_json(args.variogram_file)
+        print(f"Saved variogram to {args.variogram_file}")
     
     # Create interpolation grid
     grid_x = np.linspace(np.min(x), np.max(x), args.grid_size)
     grid_y = np.linspace(np.min(y), np.max(y), args.grid_size)
     
+    # Stream grids straight to binary output files
+    binary_output = bool(args.output) and args.output.lower().endswith(('.tif', '.tiff', '.npy'))
+    writer = None
+    if binary_output and args.method != 'compare':
+        writer = GridFileWriter(args.output, grid_x, grid_y, crs=args.crs)
+    
     # Perform interpolation based on method
     if args.method == 'ordinary':
-        z_pred, ss_pred = interpolator.ordinary_kriging(grid_x, grid_y)
+        z_pred, ss_pred = interpolator.ordinary_kriging(grid_x, grid_y, out=writer)
         
         if args.cross_validate:
-            interpolator.cross_validate('ordinary')
+            interpolator.cross_validate('ordinary', leave_one_out=args.loo)
             
     elif args.method == 'universal':
-        z_pred, ss_pred = interpolator.universal_kriging(grid_x, grid_y)
+        z_pred, ss_pred = interpolator.universal_kriging(grid_x, grid_y, out=writer)
         
         if args.cross_validate:
-            interpolator.cross_validate('universal')
+            interpolator.cross_validate('universal', leave_one_out=args.loo)
             
+    elif args.method == 'local':
+        z_pred, ss_pred = interpolator.local_kriging(grid_x, grid_y, args.neighbors, out=writer)
+        
+        if args.cross_validate:
+            interpolator.cross_validate('local', leave_one_out=args.loo, n_neighbors=args.neighbors)
+        
+    elif args.method == 'tapered':
+        z_pred, ss_pred = interpolator.tapered_kriging(
+            grid_x, grid_y, args.taper_range, args.solver, args.tapered_variance, out=writer
+        )
+        
     elif args.method == 'indicator':
-        predictions, variances, thresholds = interpolator.indicator_kriging(grid_x, grid_y)
-        print(f"Generated {len(predictions)} indicator maps")
+        predictions, variances, thresholds = interpolator.indicator_kriging(grid_x, grid_y, out=writer)
+        print(f"Generated {len(thresholds)} indicator maps")
+        if writer is not None:
+            writer.descriptions = [f'P(z <= {t:g})' for t in thresholds]
         
     elif args.method == 'compare':
         results = interpolator.compare_methods(grid_x, grid_y)
         
+        if binary_output:
+            stem, extension = os.path.splitext(args.output)
+            for name, result in results.items():
+                path = f"{stem}_{name}{extension}"
+                with GridFileWriter(path, grid_x, grid_y, crs=args.crs) as method_writer:
+                    method_writer.write(result['prediction'], result['variance'])
+                print(f"Saved {name.replace('_', ' ')} grid to {path}")
+        
     # Plot variogram if requested
     if args.plot_variogram and args.method in ['ordinary', 'universal']:
         interpolator.plot_variogram(args.method)
     
     # Save output if specified
-    if args.output and args.method in ['ordinary', 'universal']:
+    if writer is not None:
+        writer.close()
+        print(f"Saved interpolated grid to {args.output}")
+    elif args.output and args.method in ['ordinary', 'universal', 'local', 'tapered']:
         np.savetxt(args.output, z_pred, delimiter=',')
         print(f"Saved interpolated grid to {args.output}")
     
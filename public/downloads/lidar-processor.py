@@ -5,21 +5,407 @@ Process and analyze LiDAR point clouds for forestry, urban planning, and archaeo
 
 License: BSD-3
 Author: HaritaHive Team
-Dependencies: open3d, numpy, laspy
+Dependencies: open3d, numpy, scipy, laspy
 """
 
 import open3d as o3d
 import numpy as np
 import laspy
 import argparse
+import json
+import os
 from pathlib import Path
+from scipy.sparse import coo_matrix
+from scipy.spatial import cKDTree
+from scipy.sparse.csgraph import connected_components
+
+
+# ASPRS LAS classification codes
+ASPRS_UNCLASSIFIED = 1
+ASPRS_GROUND = 2
+ASPRS_HIGH_VEGETATION = 5
+ASPRS_BUILDING = 6
+
+# Half of the 26-neighbourhood; the other half is covered by symmetry
+NEIGHBOR_OFFSETS = np.array([
+    (dx, dy, dz)
+    for dx in (-1, 0, 1)
+    for dy in (-1, 0, 1)
+    for dz in (-1, 0, 1)
+    if (dx, dy, dz) > (0, 0, 0)
+])
+
+
+def voxel_cluster_labels(points, voxel_size):
+    """
+    Cluster points by connected components of occupied voxels
+
+    Points are hashed into voxel_size cells and 26-adjacent occupied cells
+    are unioned, so any two points closer than voxel_size end up in the same
+    cluster. This is a coarser superset of eps-connectivity (single linkage
+    with eps=voxel_size): points up to 2 * sqrt(3) * voxel_size apart can be
+    linked, and there is no DBSCAN-style min_points core test, so clusters
+    merge more readily than with DBSCAN. Runs in near-linear time and memory.
+
+    Args:
+        points: (N, 3) array of coordinates
+        voxel_size: Voxel edge length (clustering distance)
+
+    Returns:
+        int32 array of cluster labels, one per point
+    """
+    if len(points) == 0:
+        return np.empty(0, dtype=np.int32)
+
+    # Integer voxel coordinates, padded by one cell so neighbour keys never wrap
+    voxels = np.floor((points - points.min(axis=0)) / voxel_size).astype(np.int64) + 1
+    dims = voxels.max(axis=0) + 2
+    keys = np.ravel_multi_index(voxels.T, dims)
+
+    voxel_keys, point_voxel = np.unique(keys, return_inverse=True)
+    n_voxels = len(voxel_keys)
+
+    # Link each occupied voxel to its occupied neighbours
+    strides = np.array([dims[1] * dims[2], dims[2], 1])
+    rows, cols = [], []
+    for offset in NEIGHBOR_OFFSETS @ strides:
+        neighbor_keys = voxel_keys + offset
+        pos = np.searchsorted(voxel_keys, neighbor_keys)
+        pos[pos == n_voxels] = 0
+        hit = voxel_keys[pos] == neighbor_keys
+        rows.append(np.flatnonzero(hit))
+        cols.append(pos[hit])
+
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    graph = coo_matrix(
+        (np.ones(len(rows), dtype=np.int8), (rows, cols)),
+        shape=(n_voxels, n_voxels)
+    )
+    _, voxel_labels = connected_components(graph, directed=False)
+
+    return voxel_labels.astype(np.int32)[point_voxel.ravel()]
+
+
+def statistical_outlier_mask(points, index, nb_neighbors=20, std_ratio=2.0,
+                             workers=-1, chunk_size=1_000_000):
+    """
+    Keep-mask for statistical outlier removal
+    
+    A point is an outlier when its mean distance to its nb_neighbors nearest
+    neighbours exceeds the global mean by more than std_ratio standard
+    deviations. KD-tree queries run in parallel and in chunks.
+    
+    Args:
+        points: (N, 3) array of coordinates
+        index: Indices of the points to filter
+    
+    Returns:
+        Boolean mask over index, True for points to keep
+    """
+    subset = points[index]
+    tree = cKDTree(subset)
+    
+    mean_distances = np.empty(len(subset))
+    for start in range(0, len(subset), chunk_size):
+        distances, _ = tree.query(subset[start:start + chunk_size],
+                                  k=nb_neighbors + 1, workers=workers)
+        # First neighbour is the point itself
+        mean_distances[start:start + chunk_size] = distances[:, 1:].mean(axis=1)
+    
+    threshold = mean_distances.mean() + std_ratio * mean_distances.std()
+    return mean_distances <= threshold
+
+
+def voxel_downsample_mask(points, index, voxel_size):
+    """
+    Keep-mask selecting one point (the first) per occupied voxel
+    
+    Args:
+        points: (N, 3) array of coordinates
+        index: Indices of the points to downsample
+    
+    Returns:
+        Boolean mask over index, True for points to keep
+    """
+    keep = np.zeros(len(index), dtype=bool)
+    if len(index) == 0:
+        return keep
+    
+    subset = points[index]
+    voxels = np.floor((subset - subset.min(axis=0)) / voxel_size).astype(np.int64)
+    keys = np.ravel_multi_index(voxels.T, voxels.max(axis=0) + 1)
+    
+    _, first = np.unique(keys, return_index=True)
+    keep[first] = True
+    return keep
+
+
+def morton_encode(cells):
+    """Interleave (N, 3) integer cell coordinates (< 2**21) into uint64 Morton codes"""
+    codes = np.zeros(len(cells), dtype=np.uint64)
+    for axis in range(3):
+        v = cells[:, axis].astype(np.uint64) & np.uint64(0x1fffff)
+        v = (v | v << np.uint64(32)) & np.uint64(0x1f00000000ffff)
+        v = (v | v << np.uint64(16)) & np.uint64(0x1f0000ff0000ff)
+        v = (v | v << np.uint64(8)) & np.uint64(0x100f00f00f00f00f)
+        v = (v | v << np.uint64(4)) & np.uint64(0x10c30c30c30c30c3)
+        v = (v | v << np.uint64(2)) & np.uint64(0x1249249249249249)
+        codes |= v << np.uint64(axis)
+    return codes
+
+
+def morton_decode(codes):
+    """Inverse of morton_encode, returns (N, 3) int64 cell coordinates"""
+    cells = np.empty((len(codes), 3), dtype=np.int64)
+    for axis in range(3):
+        v = (codes >> np.uint64(axis)) & np.uint64(0x1249249249249249)
+        v = (v ^ (v >> np.uint64(2))) & np.uint64(0x10c30c30c30c30c3)
+        v = (v ^ (v >> np.uint64(4))) & np.uint64(0x100f00f00f00f00f)
+        v = (v ^ (v >> np.uint64(8))) & np.uint64(0x1f0000ff0000ff)
+        v = (v ^ (v >> np.uint64(16))) & np.uint64(0x1f00000000ffff)
+        v = (v ^ (v >> np.uint64(32))) & np.uint64(0x1fffff)
+        cells[:, axis] = v
+    return cells
+
+
+class PointCloudIndex:
+    """
+    On-disk octree index of a LAS/LAZ file, laid out like COPC
+    
+    Every point is stored once in an octree node. A node at level L holds one
+    point per cell of a 2**span grid over its extent, and the deepest level
+    holds the remaining points, so reading levels 0..L gives a progressively
+    denser, spatially uniform cloud. Node pages are contiguous in a
+    memory-mapped points.npy, so queries only read the pages they need.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, index_dir):
+        self.index_dir = Path(index_dir)
+        with open(self.index_dir / 'index.json') as f:
+            self.meta = json.load(f)
+        self.points = np.load(self.index_dir / 'points.npy', mmap_mode='r')
+        self.nodes = np.load(self.index_dir / 'nodes.npy')
+    
+    @staticmethod
+    def default_dir(las_path):
+        """Index directory stored next to the source file"""
+        return Path(f"{las_path}.index")
+    
+    @classmethod
+    def is_current(cls, las_path, index_dir):
+        """Check that an index exists and was built from the current source file"""
+        meta_path = Path(index_dir) / 'index.json'
+        if not meta_path.exists():
+            return False
+        
+        with open(meta_path) as f:
+            meta = json.load(f)
+        stat = os.stat(las_path)
+        
+        return (meta.get('version') == cls.VERSION and
+                meta.get('source_size') == stat.st_size and
+                meta.get('source_mtime') == stat.st_mtime)
+    
+    @classmethod
+    def open(cls, las_path, index_dir=None, rebuild=False):
+        """Open the index of a LAS/LAZ file, building it if missing or stale"""
+        index_dir = Path(index_dir) if index_dir else cls.default_dir(las_path)
+        
+        if rebuild or not cls.is_current(las_path, index_dir):
+            cls.build(las_path, index_dir)
+        
+        return cls(index_dir)
+    
+    @classmethod
+    def build(cls, las_path, index_dir, span=6, max_node_points=100_000):
+        """
+        Build the octree index for a LAS/LAZ file
+        
+        Args:
+            las_path: Source LAS/LAZ file
+            index_dir: Output directory
+            span: Sampling grid of each node is 2**span cells per axis
+            max_node_points: Target upper bound for points in a leaf node
+        """
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        
+        las_file = laspy.read(las_path)
+        xyz = np.vstack((las_file.x, las_file.y, las_file.z)).transpose()
+        n_points = len(xyz)
+        has_color = hasattr(las_file, 'red')
+        
+        # Cubic root node; surfaces grow ~4x per level, which sets the leaf level
+        origin = xyz.min(axis=0)
+        cube_size = float(np.max(xyz.max(axis=0) - origin)) or 1.0
+        max_level = 0
+        while n_points / 4 ** max_level > max_node_points:
+            max_level += 1
+        depth = min(max_level + span, 21)
+        max_level = max(depth - span, 0)
+        
+        cells = np.floor((xyz - origin) / cube_size * 2 ** depth).astype(np.int64)
+        np.clip(cells, 0, 2 ** depth - 1, out=cells)
+        codes = morton_encode(cells)
+        del cells
+        
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        
+        # A point belongs to the coarsest level at which it is the first point in its sampling cell
+        levels = np.full(n_points, max_level, dtype=np.uint8)
+        for level in range(max_level - 1, -1, -1):
+            cell_keys = codes >> np.uint64(3 * (depth - level - span))
+            first = np.empty(n_points, dtype=bool)
+            first[0] = True
+            np.not_equal(cell_keys[1:], cell_keys[:-1], out=first[1:])
+            levels[first] = level
+        
+        node_keys = codes >> (np.uint64(3) * (np.uint64(depth) - levels.astype(np.uint64)))
+        node_order = np.lexsort((node_keys, levels))
+        order = order[node_order]
+        levels = levels[node_order]
+        node_keys = node_keys[node_order]
+        del codes, node_order
+        
+        # Node pages
+        starts = np.flatnonzero(np.concatenate((
+            [True],
+            (levels[1:] != levels[:-1]) | (node_keys[1:] != node_keys[:-1])
+        )))
+        nodes = np.zeros(len(starts), dtype=[
+            ('level', 'u1'), ('key', 'u8'), ('offset', 'u8'), ('count', 'u8')
+        ])
+        nodes['level'] = levels[starts]
+        nodes['key'] = node_keys[starts]
+        nodes['offset'] = starts
+        nodes['count'] = np.diff(np.append(starts, n_points))
+        np.save(index_dir / 'nodes.npy', nodes)
+        
+        # Point records, written field by field into the memory-mapped file
+        fields = [('x', 'f8'), ('y', 'f8'), ('z', 'f8')]
+        if has_color:
+            fields += [('red', 'u2'), ('green', 'u2'), ('blue', 'u2')]
+        fields.append(('source_index', 'u8'))
+        
+        points = np.lib.format.open_memmap(
+            index_dir / 'points.npy', mode='w+', dtype=fields, shape=(n_points,)
+        )
+        for axis, name in enumerate('xyz'):
+            points[name] = xyz[order, axis]
+        if has_color:
+            for name in ('red', 'green', 'blue'):
+                points[name] = np.asarray(las_file[name])[order]
+        points['source_index'] = order
+        points.flush()
+        del points
+        
+        stat = os.stat(las_path)
+        meta = {
+            'version': cls.VERSION,
+            'source_path': str(las_path),
+            'source_size': stat.st_size,
+            'source_mtime': stat.st_mtime,
+            'point_count': n_points,
+            'has_color': has_color,
+            'origin': origin.tolist(),
+            'cube_size': cube_size,
+            'depth': depth,
+            'span': span,
+            'max_level': max_level
+        }
+        with open(index_dir / 'index.json', 'w') as f:
+            json.dump(meta, f, indent=2)
+        
+        print(f"Built octree index with {len(nodes)} nodes ({max_level + 1} levels) in {index_dir}")
+    
+    def node_bounds(self, nodes=None):
+        """Min and max corners of nodes, as two (M, 3) arrays"""
+        nodes = self.nodes if nodes is None else nodes
+        size = self.meta['cube_size'] / 2.0 ** nodes['level'].astype(np.float64)
+        mins = np.asarray(self.meta['origin']) + morton_decode(nodes['key']) * size[:, None]
+        return mins, mins + size[:, None]
+    
+    def select_nodes(self, bounds=None, max_level=None):
+        """
+        Nodes intersecting a 2D bounding box, up to a level of detail
+        
+        Args:
+            bounds: (min_x, min_y, max_x, max_y) or None for the full extent
+            max_level: Deepest level to include, or None for full resolution
+        """
+        mask = np.ones(len(self.nodes), dtype=bool)
+        
+        if max_level is not None:
+            mask &= self.nodes['level'] <= max_level
+        
+        if bounds is not None:
+            min_x, min_y, max_x, max_y = bounds
+            mins, maxs = self.node_bounds()
+            mask &= ((mins[:, 0] <= max_x) & (maxs[:, 0] >= min_x) &
+                     (mins[:, 1] <= max_y) & (maxs[:, 1] >= min_y))
+        
+        return self.nodes[mask]
+    
+    def query(self, bounds=None, max_level=None):
+        """Read the point records of the selected nodes"""
+        nodes = self.select_nodes(bounds, max_level)
+        
+        pages = [self.points[offset:offset + count]
+                 for offset, count in zip(nodes['offset'], nodes['count'])]
+        records = np.concatenate(pages) if pages else np.array(self.points[:0])
+        
+        if bounds is not None:
+            min_x, min_y, max_x, max_y = bounds
+            inside = ((records['x'] >= min_x) & (records['x'] <= max_x) &
+                      (records['y'] >= min_y) & (records['y'] <= max_y))
+            records = records[inside]
+        
+        return records
+
 
 class LiDARProcessor:
     def __init__(self):
-        self.point_cloud = None
         self.ground_points = None
         self.vegetation_points = None
         self.building_points = None
+        
+        # Loaded coordinates/colors and the indices of points still in the cloud;
+        # filters only shrink `active`, the Open3D cloud is built on demand
+        self.points = None
+        self.colors = None
+        self.active = None
+        self._point_cloud = None
+        
+        # Source LAS file and, for every loaded point, its record index there
+        self.source_path = None
+        self.source_index = None
+        
+        # Class memberships as indices into point_cloud
+        self.ground_index = None
+        self.vegetation_index = None
+        self.building_index = None
+    
+    @property
+    def point_cloud(self):
+        """Open3D point cloud of the active points, materialized on first use"""
+        if self._point_cloud is None and self.points is not None:
+            self._point_cloud = o3d.geometry.PointCloud()
+            self._point_cloud.points = o3d.utility.Vector3dVector(self.points[self.active])
+            if self.colors is not None:
+                self._point_cloud.colors = o3d.utility.Vector3dVector(self.colors[self.active])
+        return self._point_cloud
+    
+    def _set_points(self, points, colors, source_path, source_index):
+        self.points = points
+        self.colors = colors
+        self.active = np.arange(len(points))
+        self._point_cloud = None
+        self.source_path = source_path
+        self.source_index = source_index
     
     def load_las_file(self, filepath):
         """Load LAS/LAZ file"""
@@ -28,18 +414,35 @@ class LiDARProcessor:
         # Extract coordinates
         points = np.vstack((las_file.x, las_file.y, las_file.z)).transpose()
         
-        # Create Open3D point cloud
-        self.point_cloud = o3d.geometry.PointCloud()
-        self.point_cloud.points = o3d.utility.Vector3dVector(points)
-        
         # Add colors if available
+        colors = None
         if hasattr(las_file, 'red'):
             colors = np.vstack((las_file.red, las_file.green, las_file.blue)).transpose()
             colors = colors / 65535.0  # Normalize to 0-1
-            self.point_cloud.colors = o3d.utility.Vector3dVector(colors)
+        
+        self._set_points(points, colors, filepath, np.arange(len(points)))
         
         print(f"Loaded {len(points)} points from {filepath}")
-        return self.point_cloud
+        return self.points
+    
+    def load_indexed(self, filepath, bounds=None, max_level=None,
+                     index_dir=None, rebuild=False):
+        """Load points from a LAS/LAZ file through its octree index"""
+        index = PointCloudIndex.open(filepath, index_dir, rebuild)
+        records = index.query(bounds, max_level)
+        
+        points = np.vstack((records['x'], records['y'], records['z'])).transpose()
+        
+        colors = None
+        if index.meta['has_color']:
+            colors = np.vstack((records['red'], records['green'], records['blue'])).transpose()
+            colors = colors / 65535.0  # Normalize to 0-1
+        
+        self._set_points(points, colors, filepath,
+                         records['source_index'].astype(np.int64))
+        
+        print(f"Loaded {len(points)} of {index.meta['point_count']} points from index {index.index_dir}")
+        return self.points
     
     def classify_ground(self, threshold=0.5):
         """Classify ground points using RANSAC plane fitting"""
@@ -54,6 +457,7 @@ class LiDARProcessor:
         )
         
         # Separate ground and non-ground points
+        self.ground_index = np.asarray(inliers)
         self.ground_points = self.point_cloud.select_by_index(inliers)
         non_ground = self.point_cloud.select_by_index(inliers, invert=True)
         
@@ -83,6 +487,7 @@ class LiDARProcessor:
         
         if np.sum(height_mask) > 0:
             vegetation_indices = np.where(height_mask)[0]
+            self.vegetation_index = vegetation_indices
             self.vegetation_points = non_ground.select_by_index(vegetation_indices)
             self.vegetation_points.paint_uniform_color([0.0, 0.8, 0.0])  # Green
             
@@ -91,8 +496,9 @@ class LiDARProcessor:
         
         return None
     
-    def detect_buildings(self, min_height=3.0, max_height=50.0):
-        """Detect building structures using clustering and height filtering"""
+    def detect_buildings(self, min_height=3.0, max_height=50.0,
+                         cluster_distance=2.0, min_cluster_size=100):
+        """Detect building structures using voxel clustering and height filtering"""
         if self.ground_points is None:
             self.classify_ground()
         
@@ -106,26 +512,18 @@ class LiDARProcessor:
         # Filter by building height range
         height_mask = ((points[:, 2] - ground_z) >= min_height) & \
                      ((points[:, 2] - ground_z) <= max_height)
+        candidate_indices = np.flatnonzero(height_mask)
         
-        if np.sum(height_mask) > 0:
-            building_candidates = non_ground.select_by_index(np.where(height_mask)[0])
-            
+        if len(candidate_indices) > 0:
             # Cluster potential building points
-            labels = np.array(building_candidates.cluster_dbscan(
-                eps=2.0, min_points=50, print_progress=False
-            ))
+            labels = voxel_cluster_labels(points[candidate_indices], cluster_distance)
             
-            # Filter clusters by size and shape
-            building_indices = []
-            for label in np.unique(labels):
-                if label == -1:  # Noise
-                    continue
-                
-                cluster_mask = labels == label
-                if np.sum(cluster_mask) > 100:  # Minimum cluster size
-                    building_indices.extend(np.where(height_mask)[0][cluster_mask])
+            # Keep clusters above the minimum size
+            cluster_sizes = np.bincount(labels)
+            building_indices = candidate_indices[cluster_sizes[labels] > min_cluster_size]
             
-            if building_indices:
+            if len(building_indices) > 0:
+                self.building_index = building_indices
                 self.building_points = non_ground.select_by_index(building_indices)
                 self.building_points.paint_uniform_color([0.8, 0.0, 0.0])  # Red
                 
@@ -175,47 +573,91 @@ class LiDARProcessor:
         print(f"Generated CHM with resolution {resolution}m")
         return chm, x_coords, y_coords
     
-    def filter_noise(self, nb_neighbors=20, std_ratio=2.0):
+    def filter_noise(self, nb_neighbors=20, std_ratio=2.0, workers=-1):
         """Remove statistical outliers"""
-        if self.point_cloud is None:
+        if self.points is None:
             raise ValueError("No point cloud loaded")
         
-        cl, ind = self.point_cloud.remove_statistical_outlier(
-            nb_neighbors=nb_neighbors,
-            std_ratio=std_ratio
-        )
+        keep = statistical_outlier_mask(self.points, self.active,
+                                        nb_neighbors, std_ratio, workers)
         
-        self.point_cloud = self.point_cloud.select_by_index(ind)
-        print(f"Removed {len(self.point_cloud.points) - len(ind)} outlier points")
+        print(f"Removed {len(keep) - np.count_nonzero(keep)} outlier points")
+        self.active = self.active[keep]
+        self._point_cloud = None
         
-        return self.point_cloud
+        return keep
     
     def downsample(self, voxel_size=0.1):
         """Downsample point cloud using voxel grid"""
+        if self.points is None:
+            raise ValueError("No point cloud loaded")
+        
+        keep = voxel_downsample_mask(self.points, self.active, voxel_size)
+        
+        print(f"Downsampled from {len(keep)} to {np.count_nonzero(keep)} points")
+        self.active = self.active[keep]
+        self._point_cloud = None
+        
+        return keep
+    
+    def classification_codes(self):
+        """Per-point ASPRS classification codes for the current point cloud"""
         if self.point_cloud is None:
             raise ValueError("No point cloud loaded")
         
-        original_size = len(self.point_cloud.points)
-        self.point_cloud = self.point_cloud.voxel_down_sample(voxel_size)
+        codes = np.full(len(self.active), ASPRS_UNCLASSIFIED, dtype=np.uint8)
+        
+        # Later classes take precedence (buildings are a subset of the vegetation height band)
+        if self.ground_index is not None:
+            codes[self.ground_index] = ASPRS_GROUND
+        if self.vegetation_index is not None:
+            codes[self.vegetation_index] = ASPRS_HIGH_VEGETATION
+        if self.building_index is not None:
+            codes[self.building_index] = ASPRS_BUILDING
         
-        print(f"Downsampled from {original_size} to {len(self.point_cloud.points)} points")
-        return self.point_cloud
+        return codes
     
-    def save_classified_clouds(self, output_dir):
-        """Save classified point clouds"""
-        output_dir = Path(output_dir)
-        output_dir.mkdir(exist_ok=True)
+    def save_classified_las(self, output_path, chunk_size=1_000_000):
+        """
+        Save the processed points to a single LAS/LAZ file with ASPRS classes
+        
+        Original point records (intensity, returns, GPS time, colour, ...) are
+        streamed from the source file chunk by chunk; only the classification
+        field is rewritten. LAZ output is chosen from the file extension.
+        """
+        if self.source_path is None:
+            raise ValueError("No point cloud loaded")
         
-        if self.ground_points:
-            o3d.io.write_point_cloud(str(output_dir / "ground.ply"), self.ground_points)
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        if self.vegetation_points:
-            o3d.io.write_point_cloud(str(output_dir / "vegetation.ply"), self.vegetation_points)
+        with laspy.open(self.source_path) as reader:
+            # Class code per source record; 0 marks records that were filtered out
+            source_codes = np.zeros(reader.header.point_count, dtype=np.uint8)
+            source_codes[self.source_index[self.active]] = self.classification_codes()
+            
+            with laspy.open(output_path, mode='w', header=reader.header) as writer:
+                start = 0
+                for chunk in reader.chunk_iterator(chunk_size):
+                    chunk_codes = source_codes[start:start + len(chunk)]
+                    start += len(chunk)
+                    
+                    keep = chunk_codes != 0
+                    if not np.any(keep):
+                        continue
+                    
+                    chunk = chunk[keep]
+                    chunk.classification[:] = chunk_codes[keep]
+                    writer.write_points(chunk)
         
-        if self.building_points:
-            o3d.io.write_point_cloud(str(output_dir / "buildings.ply"), self.building_points)
+        print(f"Saved {len(self.active)} classified points to {output_path}")
+    
+    def save_classified_clouds(self, output_dir, output_format='las'):
+        """Save classified point clouds as one LAS/LAZ file"""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(exist_ok=True)
         
-        print(f"Saved classified point clouds to {output_dir}")
+        self.save_classified_las(output_dir / f"classified.{output_format}")
     
     def visualize(self):
         """Visualize point cloud"""
@@ -239,14 +681,28 @@ def main():
     parser = argparse.ArgumentParser(description='Process LiDAR point clouds')
     parser.add_argument('input', help='Input LAS/LAZ file')
     parser.add_argument('--output-dir', default='output', help='Output directory')
+    parser.add_argument('--index', action='store_true',
+                       help='Load through an on-disk octree index (built on first use)')
+    parser.add_argument('--index-dir', help='Index directory (default: <input>.index)')
+    parser.add_argument('--rebuild-index', action='store_true',
+                       help='Rebuild the octree index even if it is up to date')
+    parser.add_argument('--bounds', type=float, nargs=4,
+                       metavar=('MIN_X', 'MIN_Y', 'MAX_X', 'MAX_Y'),
+                       help='Only process points inside this area (uses the index)')
+    parser.add_argument('--lod', type=int,
+                       help='Maximum octree level of detail to load (uses the index)')
     parser.add_argument('--ground-threshold', type=float, default=0.5, 
                        help='Ground plane threshold')
     parser.add_argument('--veg-height', type=float, default=0.5,
                        help='Minimum vegetation height')
     parser.add_argument('--building-min-height', type=float, default=3.0,
                        help='Minimum building height')
+    parser.add_argument('--building-cluster-distance', type=float, default=2.0,
+                       help='Voxel size used to cluster building points')
     parser.add_argument('--downsample', type=float, default=0.1,
                        help='Voxel size for downsampling')
+    parser.add_argument('--output-format', choices=['las', 'laz'], default='las',
+                       help='Classified point cloud format')
     parser.add_argument('--visualize', action='store_true',
                        help='Show 3D visualization')
     
@@ -256,7 +712,12 @@ def main():
     processor = LiDARProcessor()
     
     # Load point cloud
-    processor.load_las_file(args.input)
+    if args.index or args.index_dir or args.rebuild_index or \
+            args.bounds is not None or args.lod is not None:
+        processor.load_indexed(args.input, args.bounds, args.lod,
+                               args.index_dir, args.rebuild_index)
+    else:
+        processor.load_las_file(args.input)
     
     # Preprocess
     processor.filter_noise()
@@ -265,13 +726,14 @@ def main():
     # Classify
     processor.classify_ground(args.ground_threshold)
     processor.detect_vegetation(args.veg_height)
-    processor.detect_buildings(args.building_min_height)
+    processor.detect_buildings(args.building_min_height,
+                               cluster_distance=args.building_cluster_distance)
     
     # Calculate CHM
     chm, x_coords, y_coords = processor.calculate_canopy_height_model()
     
     # Save results
-    processor.save_classified_clouds(args.output_dir)
+    processor.save_classified_clouds(args.output_dir, args.output_format)
     
     # Visualize if requested
     if args.visualize:
@@ -9,27 +9,505 @@ a comprehensive vegetation health report with visualizations.
 Author: HaritaHive Team
 Version: 1.0
 License: MIT
+
+Usage:
+    python ndvi_health_index.py --red B04.tif --nir B08.tif
+    python ndvi_health_index.py --manifest scenes.csv --windowed --workers 8
+    python ndvi_health_index.py --glob "scenes/**/*B04*.tif" --no-plots
 """
 
 import rasterio
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Reports are only saved to file, also from worker processes
 import matplotlib.pyplot as plt
 import seaborn as sns
 from rasterio.plot import show
-from rasterio.mask import mask
+from rasterio.features import rasterize
+from rasterio.windows import Window
+from rasterio.enums import Resampling
 import geopandas as gpd
 from pathlib import Path
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import ast
+import csv
+import glob
+import hashlib
 import json
+import os
+import sys
+import time
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import numexpr as ne
+except ImportError:  # Fall back to plain NumPy evaluation
+    ne = None
+
+# Vegetation classes and the NDVI thresholds separating them
+CLASS_NAMES = ['No Vegetation', 'Sparse', 'Moderate', 'Dense']
+CLASS_THRESHOLDS = (0.0, 0.2, 0.5)
+CLASS_NODATA = 255
+
+# Batch processing: per-scene report, up-to-date stamp and manifest band columns
+REPORT_NAME = 'ndvi_health_report.json'
+STAMP_NAME = '.ndvi_inputs.json'
+BAND_COLUMNS = ('red', 'nir', 'blue', 'green', 'swir2')
+
+# Band-math expressions over named bands (reflectance-scaled for EVI/SAVI)
+SPECTRAL_INDICES = {
+    'ndvi': '(nir - red) / (nir + red)',
+    'evi': '2.5 * (nir - red) / (nir + 6.0 * red - 7.5 * blue + 1.0)',
+    'savi': '1.5 * (nir - red) / (nir + red + 0.5)',
+    'ndwi': '(green - nir) / (green + nir)',
+    'nbr': '(nir - swir2) / (nir + swir2)'
+}
+
+# Histogram range of each index (values outside land in the edge bins)
+SPECTRAL_INDEX_RANGES = {
+    'ndvi': (-1.0, 1.0),
+    'evi': (-2.5, 2.5),
+    'savi': (-1.5, 1.5),
+    'ndwi': (-1.0, 1.0),
+    'nbr': (-1.0, 1.0)
+}
+DEFAULT_INDEX_RANGE = (-1.0, 1.0)
+
+# Syntax allowed in index expressions: arithmetic on band names and numbers
+EXPRESSION_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd
+)
+
+def validate_expression(name, expression, bands=BAND_COLUMNS):
+    """Parse an index expression, allowing only arithmetic on the given band names"""
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression for {name}: {e}") from None
+    for node in ast.walk(tree):
+        if not isinstance(node, EXPRESSION_NODES):
+            raise ValueError(f"Unsupported syntax in expression for {name}: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in bands:
+            raise ValueError(f"Unknown band '{node.id}' in expression for {name}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Only numeric constants are allowed in expression for {name}")
+    return tree
+
+def raster_profile(metadata, dtype, **options):
+    """Tiled, LZW-compressed single-band GeoTIFF profile for the given grid"""
+    profile = {
+        'driver': 'GTiff',
+        'height': metadata['height'],
+        'width': metadata['width'],
+        'count': 1,
+        'dtype': dtype,
+        'crs': metadata['crs'],
+        'transform': metadata['transform'],
+        'tiled': True,
+        'blockxsize': 256,
+        'blockysize': 256,
+        'compress': 'lzw'
+    }
+    profile.update(options)
+    return profile
+
+def build_overviews(dst, resampling, min_size=256):
+    """Add internal overviews down to about min_size pixels on the long side"""
+    factors = []
+    factor = 2
+    while max(dst.width, dst.height) / factor >= min_size:
+        factors.append(factor)
+        factor *= 2
+    if factors:
+        dst.build_overviews(factors, resampling)
+
+def read_overview(path, max_size, resampling):
+    """Read band 1 decimated to at most max_size pixels on the long side (uses overviews)"""
+    with rasterio.open(path) as src:
+        scale = max(src.width, src.height) / max_size
+        if scale <= 1:
+            return src.read(1)
+        out_shape = (max(1, int(src.height / scale)), max(1, int(src.width / scale)))
+        return src.read(1, out_shape=out_shape, resampling=resampling)
+
+def decimate(array, max_size):
+    """Strided view of an in-memory raster with at most max_size pixels on the long side"""
+    step = max(1, int(np.ceil(max(array.shape) / max_size)))
+    return array[::step, ::step]
+
+def read_metadata(src):
+    """Georeferencing of a raster dataset"""
+    return {
+        'crs': src.crs,
+        'transform': src.transform,
+        'bounds': src.bounds,
+        'width': src.width,
+        'height': src.height
+    }
+
+def iter_windows(width, height, block_size):
+    """Yield row-major windows of at most block_size x block_size pixels"""
+    for row_off in range(0, height, block_size):
+        for col_off in range(0, width, block_size):
+            yield Window(col_off, row_off,
+                         min(block_size, width - col_off),
+                         min(block_size, height - row_off))
+
+def compute_ndvi(red, nir, out=None, scratch=None):
+    """
+    Compute NDVI = (NIR - Red) / (NIR + Red) in float32
+    
+    Pixels where NIR + Red == 0 are set to 0. `out` and `scratch` are optional
+    float32 buffers shaped like the inputs; passing them avoids allocating
+    temporaries when called once per block.
+    """
+    if out is None:
+        out = np.empty(red.shape, dtype=np.float32)
+    if scratch is None:
+        scratch = np.empty(red.shape, dtype=np.float32)
+        
+    np.add(nir, red, out=scratch)
+    zero = scratch == 0
+    scratch[zero] = 1
+    
+    np.subtract(nir, red, out=out)
+    np.divide(out, scratch, out=out)
+    out[zero] = 0
+    return out
+
+def classify_ndvi(ndvi, thresholds=CLASS_THRESHOLDS, out=None):
+    """
+    Classify NDVI into uint8 vegetation classes
+    
+    Class i covers thresholds[i-1] <= NDVI < thresholds[i]; NaN pixels are
+    set to CLASS_NODATA. `out` is an optional uint8 buffer shaped like ndvi.
+    """
+    if out is None:
+        out = np.empty(ndvi.shape, dtype=np.uint8)
+        
+    np.copyto(out, np.digitize(ndvi, thresholds), casting='unsafe')
+    out[np.isnan(ndvi)] = CLASS_NODATA
+    return out
+
+def class_stats_from_counts(counts):
+    """Pixel count and percentage of every vegetation class present"""
+    counts = np.asarray(counts)[:len(CLASS_NAMES)]
+    total_pixels = counts.sum()
+    return {
+        name: {
+            'count': int(count),
+            'percentage': float(count / total_pixels * 100)
+        }
+        for name, count in zip(CLASS_NAMES, counts)
+        if count > 0
+    }
+
+def validate_thresholds(thresholds):
+    """Check that class thresholds are ascending and match CLASS_NAMES"""
+    thresholds = tuple(float(t) for t in thresholds)
+    if len(thresholds) != len(CLASS_NAMES) - 1:
+        raise ValueError(f"Expected {len(CLASS_NAMES) - 1} class thresholds, got {len(thresholds)}")
+    if any(a >= b for a, b in zip(thresholds, thresholds[1:])):
+        raise ValueError("Class thresholds must be strictly ascending")
+    return thresholds
+
+def histogram_quantiles(histogram, bin_edges, q):
+    """
+    Quantiles for every row of a (groups, bins) histogram
+    
+    Values are interpolated linearly within the bin holding each quantile.
+    Rows without counts give NaN.
+    
+    Returns:
+        (groups, len(q)) float64 array
+    """
+    q = np.asarray(q, dtype=np.float64)
+    cumulative = np.cumsum(histogram, axis=1, dtype=np.int64)
+    totals = cumulative[:, -1]
+    rows = np.arange(len(histogram))
+    width = bin_edges[1] - bin_edges[0]
+    
+    result = np.empty((len(histogram), len(q)))
+    for j, fraction in enumerate(q):
+        target = fraction * totals
+        i = np.argmax(cumulative >= target[:, None], axis=1)
+        below = np.where(i > 0, cumulative[rows, i - 1], 0)
+        in_bin = histogram[rows, i]
+        within = np.divide(target - below, in_bin, out=np.zeros(len(rows)), where=in_bin > 0)
+        result[:, j] = bin_edges[i] + within * width
+    
+    result[totals == 0] = np.nan
+    return result
+
+class NDVIStatistics:
+    """
+    Single-pass, mergeable NDVI (or other index) statistics
+    
+    Accumulates count/min/max/mean/variance (Welford, combined per block with
+    Chan's formula), a fixed-bin histogram over value_range used for
+    approximate quantiles, and vegetation class counts (NDVI only). Blocks can
+    be fed in any order and accumulators from different workers combined with
+    merge().
+    """
+    
+    def __init__(self, bins=200, thresholds=CLASS_THRESHOLDS, value_range=(-1.0, 1.0),
+                 classify=True):
+        """
+        Args:
+            bins (int): Number of histogram bins over value_range
+            thresholds (sequence): Ascending NDVI class thresholds
+            value_range (tuple): Histogram range; values outside count in the edge bins
+            classify (bool): Count vegetation classes (only meaningful for NDVI)
+        """
+        self.bin_edges = np.linspace(value_range[0], value_range[1], bins + 1)
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.classify = classify
+        self.class_counts = np.zeros(len(self.thresholds) + 1, dtype=np.int64)
+        
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        
+    def _combine(self, count, mean, m2, min_value, max_value):
+        """Merge moments of another sample into this accumulator"""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = min(self.min, float(min_value))
+        self.max = max(self.max, float(max_value))
+        
+    def update(self, values):
+        """Add a block of NDVI values (NaNs are ignored)"""
+        values = np.asarray(values).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        
+        deviations = values.astype(np.float64)
+        mean = deviations.mean()
+        deviations -= mean
+        self._combine(values.size, mean, float(np.dot(deviations, deviations)),
+                      values.min(), values.max())
+        
+        bins = len(self.histogram)
+        low, high = self.bin_edges[0], self.bin_edges[-1]
+        bin_index = np.floor((values - low) * (bins / (high - low)))
+        np.clip(bin_index, 0, bins - 1, out=bin_index)
+        self.histogram += np.bincount(bin_index.astype(np.intp), minlength=bins)
+        
+        if self.classify:
+            class_index = classify_ndvi(values, self.thresholds)
+            self.class_counts += np.bincount(class_index, minlength=len(self.class_counts))
+        return self
+        
+    def merge(self, other):
+        """Combine with an accumulator built over other blocks"""
+        if not np.array_equal(other.bin_edges, self.bin_edges) or \
+                not np.array_equal(other.thresholds, self.thresholds) or \
+                other.classify != self.classify:
+            raise ValueError("Cannot merge statistics with different bins or thresholds")
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+            self.histogram += other.histogram
+            self.class_counts += other.class_counts
+        return self
+        
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / self.count)) if self.count else 0.0
+        
+    def quantile(self, q):
+        """Approximate quantile(s), interpolated linearly within histogram bins"""
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+        
+        values = histogram_quantiles(self.histogram[None, :], self.bin_edges, q.ravel())[0]
+        return np.clip(values, self.min, self.max).reshape(q.shape)
+        
+    def summary(self):
+        """Statistics dictionary used by the report"""
+        q1, median, q3 = (float(v) for v in self.quantile([0.25, 0.5, 0.75]))
+        return {
+            'min': float(self.min),
+            'max': float(self.max),
+            'mean': float(self.mean),
+            'std': self.std,
+            'median': median,
+            'q1': q1,
+            'q3': q3,
+            'total_pixels': int(self.count)
+        }
+        
+    def class_stats(self):
+        """Pixel count and percentage of every vegetation class present (empty unless classifying)"""
+        if not self.classify:
+            return {}
+        return class_stats_from_counts(self.class_counts)
+
+class SpectralIndexEngine:
+    """
+    Evaluate several spectral indices over shared band windows
+    
+    Each required band window is read once per block and every index is
+    evaluated from it, with numexpr when installed and plain NumPy otherwise.
+    One float32 GeoTIFF per index is written in a single pass, and NDVI also
+    gets the vegetation classification raster.
+    """
+    
+    def __init__(self, band_paths, indices=('ndvi',), output_dir="outputs",
+                 reflectance_scale=1.0, class_thresholds=CLASS_THRESHOLDS, value_ranges=None):
+        """
+        Args:
+            band_paths (dict): Band name ('red', 'nir', 'blue', ...) to raster path
+            indices: Names from SPECTRAL_INDICES, or a dict of name to expression
+                (arithmetic on band names and numbers only)
+            output_dir (str): Directory for output files
+            reflectance_scale (float): Factor converting band values to reflectance
+                (e.g. 0.0001 for Sentinel-2 digital numbers)
+            class_thresholds (tuple): NDVI thresholds between vegetation classes
+            value_ranges (dict): Index name to statistics histogram range, overriding
+                SPECTRAL_INDEX_RANGES (default DEFAULT_INDEX_RANGE)
+        """
+        self.band_paths = dict(band_paths)
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(exist_ok=True)
+        self.reflectance_scale = reflectance_scale
+        self.class_thresholds = validate_thresholds(class_thresholds)
+        
+        if isinstance(indices, dict):
+            self.expressions = dict(indices)
+        else:
+            unknown = [name for name in indices if name not in SPECTRAL_INDICES]
+            if unknown:
+                raise ValueError(f"Unknown spectral indices: {', '.join(unknown)}")
+            self.expressions = {name: SPECTRAL_INDICES[name] for name in indices}
+        
+        self.value_ranges = {
+            name: (value_ranges or {}).get(name, SPECTRAL_INDEX_RANGES.get(name, DEFAULT_INDEX_RANGE))
+            for name in self.expressions
+        }
+        
+        # Validate and compile once; the code objects also name the bands each index needs
+        band_names = set(BAND_COLUMNS) | set(self.band_paths)
+        self._compiled = {
+            name: compile(validate_expression(name, expression, band_names), f"<{name}>", 'eval')
+            for name, expression in self.expressions.items()
+        }
+        self.required_bands = sorted(set().union(
+            *(code.co_names for code in self._compiled.values())
+        ))
+        missing = [band for band in self.required_bands if band not in self.band_paths]
+        if missing:
+            raise ValueError(f"Missing band paths for: {', '.join(missing)}")
+        
+        self.metadata = {}
+        self.stats = {}
+        
+    def output_path(self, name):
+        return self.output_dir / f"{name}_result.tif"
+        
+    def _evaluate(self, name, bands, out):
+        """Evaluate one index into `out`"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if ne is not None:
+                ne.evaluate(self.expressions[name], local_dict=bands, out=out, casting='unsafe')
+            else:
+                np.copyto(out, eval(self._compiled[name], {'__builtins__': {}}, bands),
+                          casting='unsafe')
+        return out
+        
+    def run(self, block_size=1024):
+        """
+        Compute all indices block by block
+        
+        Returns:
+            dict: Index name to NDVIStatistics accumulator
+        """
+        size = block_size * block_size
+        band_buffers = {band: np.empty(size, dtype=np.float32) for band in self.required_bands}
+        index_buffers = {name: np.empty(size, dtype=np.float32) for name in self.expressions}
+        class_buffer = np.empty(size, dtype=np.uint8)
+        valid_buffer = np.empty(size, dtype=bool)
+        
+        self.stats = {
+            name: NDVIStatistics(thresholds=self.class_thresholds, value_range=self.value_ranges[name],
+                                 classify=name == 'ndvi')
+            for name in self.expressions
+        }
+        
+        with ExitStack() as stack:
+            sources = {
+                band: stack.enter_context(rasterio.open(self.band_paths[band]))
+                for band in self.required_bands
+            }
+            first = sources[self.required_bands[0]]
+            if any(src.shape != first.shape for src in sources.values()):
+                raise ValueError("All bands must have the same dimensions")
+            self.metadata = read_metadata(first)
+            
+            index_profile = raster_profile(self.metadata, 'float32', predictor=3)
+            outputs = {
+                name: stack.enter_context(rasterio.open(self.output_path(name), 'w', **index_profile))
+                for name in self.expressions
+            }
+            class_dst = None
+            if 'ndvi' in self.expressions:
+                class_dst = stack.enter_context(rasterio.open(
+                    self.output_dir / 'vegetation_classification.tif', 'w',
+                    **raster_profile(self.metadata, 'uint8', nodata=CLASS_NODATA)
+                ))
+            
+            for window in iter_windows(first.width, first.height, block_size):
+                shape = (window.height, window.width)
+                n = window.height * window.width
+                
+                bands = {band: buf[:n].reshape(shape) for band, buf in band_buffers.items()}
+                valid = valid_buffer[:n].reshape(shape)
+                valid[...] = True
+                for band, src in sources.items():
+                    src.read(1, window=window, out=bands[band])
+                    if self.reflectance_scale != 1.0:
+                        bands[band] *= self.reflectance_scale
+                    valid &= np.isfinite(bands[band])
+                
+                for name, dst in outputs.items():
+                    result = self._evaluate(name, bands, index_buffers[name][:n].reshape(shape))
+                    # Zero denominators give 0 as in compute_ndvi; NaN inputs stay NaN
+                    result[valid & ~np.isfinite(result)] = 0
+                    dst.write(result, 1, window=window)
+                    self.stats[name].update(result)
+                    
+                    if class_dst is not None and name == 'ndvi':
+                        classes = classify_ndvi(result, self.class_thresholds,
+                                                out=class_buffer[:n].reshape(shape))
+                        class_dst.write(classes, 1, window=window)
+            
+            # Overviews keep report rendering independent of the scene size
+            for dst in outputs.values():
+                build_overviews(dst, Resampling.average)
+            if class_dst is not None:
+                build_overviews(class_dst, Resampling.mode)
+        
+        return self.stats
+
 class NDVIHealthCalculator:
     """
     Calculate and analyze NDVI for vegetation health assessment
     """
     
-    def __init__(self, red_band_path, nir_band_path, output_dir="outputs"):
+    def __init__(self, red_band_path, nir_band_path, output_dir="outputs",
+                 class_thresholds=CLASS_THRESHOLDS, extra_bands=None):
         """
         Initialize the NDVI calculator
         
@@ -37,29 +515,51 @@ class NDVIHealthCalculator:
             red_band_path (str): Path to red band raster
             nir_band_path (str): Path to NIR band raster
             output_dir (str): Directory for output files
+            class_thresholds (tuple): NDVI thresholds between vegetation classes
+            extra_bands (dict): Additional band paths ('blue', 'green', 'swir2', ...)
+                for indices other than NDVI
         """
         self.red_band_path = red_band_path
         self.nir_band_path = nir_band_path
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.class_thresholds = validate_thresholds(class_thresholds)
+        self.extra_bands = dict(extra_bands or {})
         
         # Initialize data containers
         self.red_data = None
         self.nir_data = None
         self.ndvi = None
+        self.ndvi_path = None
+        self.class_path = None
+        self.vegetation_class = None
+        self.ndvi_stats = None
+        self.index_stats = {}
         self.metadata = {}
         
+    def _read_metadata(self, src):
+        """Record georeferencing of the input bands"""
+        self.metadata.update(read_metadata(src))
+        
+    def _output_profile(self, dtype, **options):
+        """GeoTIFF profile matching the input bands"""
+        return raster_profile(self.metadata, dtype, **options)
+        
+    def _ndvi_profile(self):
+        return self._output_profile('float32', predictor=3)
+        
+    def _class_profile(self):
+        return self._output_profile('uint8', nodata=CLASS_NODATA)
+        
     def load_bands(self):
         """Load red and NIR bands from raster files"""
         try:
             with rasterio.open(self.red_band_path) as src:
-                self.red_data = src.read(1).astype(float)
-                self.metadata['crs'] = src.crs
-                self.metadata['transform'] = src.transform
-                self.metadata['bounds'] = src.bounds
+                self.red_data = src.read(1, out_dtype='float32')
+                self._read_metadata(src)
                 
             with rasterio.open(self.nir_band_path) as src:
-                self.nir_data = src.read(1).astype(float)
+                self.nir_data = src.read(1, out_dtype='float32')
                 
             print(f"✅ Bands loaded successfully")
             print(f"   Red band shape: {self.red_data.shape}")
@@ -75,76 +575,118 @@ class NDVIHealthCalculator:
             raise ValueError("Bands not loaded. Call load_bands() first.")
             
         # Calculate NDVI with division by zero protection
-        denominator = self.nir_data + self.red_data
-        self.ndvi = np.where(
-            denominator == 0,
-            0,
-            (self.nir_data - self.red_data) / denominator
-        )
+        self.ndvi = compute_ndvi(self.red_data, self.nir_data)
         
         # Calculate statistics
-        valid_pixels = self.ndvi[~np.isnan(self.ndvi)]
-        self.stats = {
-            'min': float(np.min(valid_pixels)),
-            'max': float(np.max(valid_pixels)),
-            'mean': float(np.mean(valid_pixels)),
-            'std': float(np.std(valid_pixels)),
-            'median': float(np.median(valid_pixels)),
-            'total_pixels': len(valid_pixels)
-        }
+        self.ndvi_stats = NDVIStatistics(thresholds=self.class_thresholds).update(self.ndvi)
+        self.stats = self.ndvi_stats.summary()
         
         print(f"✅ NDVI calculated successfully")
         print(f"   Range: {self.stats['min']:.3f} to {self.stats['max']:.3f}")
         print(f"   Mean: {self.stats['mean']:.3f} ± {self.stats['std']:.3f}")
         
-    def classify_vegetation(self):
+    def calculate_ndvi_windowed(self, block_size=1024, indices=('ndvi',),
+                                reflectance_scale=1.0):
+        """
+        Calculate and classify NDVI block by block
+        
+        Matching windows of the input bands are read as float32 into
+        reusable buffers, and each block is written straight to
+        ndvi_result.tif and vegetation_classification.tif. Memory use depends
+        on block_size rather than on the scene size; the full NDVI array is
+        never held in memory. Other indices (EVI, SAVI, NDWI, NBR) can be
+        computed in the same pass from extra_bands.
+        
+        Args:
+            block_size (int): Window edge length in pixels
+            indices (tuple): Spectral indices to compute alongside NDVI
+            reflectance_scale (float): Factor converting band values to reflectance
+        """
+        indices = ['ndvi'] + [name for name in indices if name != 'ndvi']
+        engine = SpectralIndexEngine(
+            {'red': self.red_band_path, 'nir': self.nir_band_path, **self.extra_bands},
+            indices,
+            output_dir=self.output_dir,
+            reflectance_scale=reflectance_scale,
+            class_thresholds=self.class_thresholds
+        )
+        index_stats = engine.run(block_size)
+        self.metadata.update(engine.metadata)
+        
+        self.ndvi_stats = index_stats.pop('ndvi')
+        self.index_stats = {name: acc.summary() for name, acc in index_stats.items()}
+        self.stats = self.ndvi_stats.summary()
+        self.class_stats = self.ndvi_stats.class_stats()
+        self.ndvi_path = engine.output_path('ndvi')
+        self.class_path = self.output_dir / 'vegetation_classification.tif'
+        
+        print(f"✅ NDVI calculated block-wise: {self.ndvi_path}")
+        print(f"   Classification: {self.class_path}")
+        print(f"   Range: {self.stats['min']:.3f} to {self.stats['max']:.3f}")
+        print(f"   Mean: {self.stats['mean']:.3f} ± {self.stats['std']:.3f}")
+        for name, stats in self.index_stats.items():
+            print(f"   {name.upper()}: {engine.output_path(name)} (mean {stats['mean']:.3f})")
+        
+    def classify_vegetation(self, thresholds=None):
         """
         Classify vegetation health based on NDVI values
         
-        Classification:
+        Classification (default thresholds):
         0: No vegetation (NDVI < 0)
         1: Sparse vegetation (0 <= NDVI < 0.2)
         2: Moderate vegetation (0.2 <= NDVI < 0.5)
         3: Dense vegetation (NDVI >= 0.5)
+        
+        Args:
+            thresholds (tuple): Override the calculator's class thresholds
         """
         if self.ndvi is None:
             raise ValueError("NDVI not calculated. Call calculate_ndvi() first.")
-            
-        self.vegetation_class = np.zeros_like(self.ndvi, dtype=int)
-        
-        # Apply classification thresholds
-        self.vegetation_class[self.ndvi < 0] = 0
-        self.vegetation_class[(self.ndvi >= 0) & (self.ndvi < 0.2)] = 1
-        self.vegetation_class[(self.ndvi >= 0.2) & (self.ndvi < 0.5)] = 2
-        self.vegetation_class[self.ndvi >= 0.5] = 3
         
-        # Calculate class statistics
-        unique, counts = np.unique(self.vegetation_class, return_counts=True)
-        total_pixels = np.sum(counts)
-        
-        self.class_stats = {}
-        class_names = ['No Vegetation', 'Sparse', 'Moderate', 'Dense']
+        if thresholds is not None:
+            self.class_thresholds = validate_thresholds(thresholds)
+            
+        self.vegetation_class = classify_ndvi(self.ndvi, self.class_thresholds)
         
-        for i, (class_id, count) in enumerate(zip(unique, counts)):
-            if class_id < len(class_names):
-                self.class_stats[class_names[class_id]] = {
-                    'count': int(count),
-                    'percentage': float(count / total_pixels * 100)
-                }
+        # Calculate class statistics (nodata falls outside the class range)
+        counts = np.bincount(self.vegetation_class.ravel(), minlength=len(CLASS_NAMES))
+        self.class_stats = class_stats_from_counts(counts)
         
         print("✅ Vegetation classification completed")
         for class_name, stats in self.class_stats.items():
             print(f"   {class_name}: {stats['percentage']:.1f}% ({stats['count']} pixels)")
             
-    def create_visualizations(self):
-        """Create comprehensive visualizations"""
+    def _map_overview(self, array, path, max_size, resampling):
+        """Decimated raster for map panels, from memory or from the saved GeoTIFF"""
+        if array is not None:
+            return decimate(array, max_size)
+        if path is None:
+            raise ValueError("NDVI not calculated. Call calculate_ndvi() first.")
+        return read_overview(path, max_size, resampling)
+        
+    def create_visualizations(self, max_map_size=1000, dpi=150):
+        """
+        Create comprehensive visualizations
+        
+        Maps are drawn from an overview of at most max_map_size pixels and the
+        histogram/boxplot from the accumulated statistics, so rendering time
+        does not grow with the scene size.
+        
+        Args:
+            max_map_size (int): Long-side pixel size of the map overviews
+            dpi (int): Resolution of the saved PNG
+        """
+        ndvi_map = self._map_overview(self.ndvi, self.ndvi_path, max_map_size, Resampling.average)
+        class_map = self._map_overview(self.vegetation_class, self.class_path,
+                                       max_map_size, Resampling.mode)
+        
         # Set up the plotting style
         plt.style.use('seaborn-v0_8')
         fig = plt.figure(figsize=(20, 12))
         
         # 1. NDVI map
         ax1 = plt.subplot(2, 3, 1)
-        im1 = ax1.imshow(self.ndvi, cmap='RdYlGn', vmin=-1, vmax=1)
+        im1 = ax1.imshow(ndvi_map, cmap='RdYlGn', vmin=-1, vmax=1)
         ax1.set_title('NDVI Distribution', fontsize=14, fontweight='bold')
         ax1.axis('off')
         plt.colorbar(im1, ax=ax1, fraction=0.046, pad=0.04, label='NDVI')
@@ -153,7 +695,8 @@ class NDVIHealthCalculator:
         ax2 = plt.subplot(2, 3, 2)
         colors = ['#8B4513', '#FFD700', '#90EE90', '#006400']  # Brown, Gold, LightGreen, DarkGreen
         cmap = plt.matplotlib.colors.ListedColormap(colors)
-        im2 = ax2.imshow(self.vegetation_class, cmap=cmap, vmin=0, vmax=3)
+        im2 = ax2.imshow(np.ma.masked_equal(class_map, CLASS_NODATA),
+                         cmap=cmap, vmin=0, vmax=3)
         ax2.set_title('Vegetation Classification', fontsize=14, fontweight='bold')
         ax2.axis('off')
         cbar2 = plt.colorbar(im2, ax=ax2, fraction=0.046, pad=0.04, ticks=[0, 1, 2, 3])
@@ -161,8 +704,9 @@ class NDVIHealthCalculator:
         
         # 3. NDVI histogram
         ax3 = plt.subplot(2, 3, 3)
-        valid_ndvi = self.ndvi[~np.isnan(self.ndvi)]
-        ax3.hist(valid_ndvi, bins=50, alpha=0.7, color='green', edgecolor='black')
+        edges = self.ndvi_stats.bin_edges
+        ax3.hist(edges[:-1], bins=edges, weights=self.ndvi_stats.histogram,
+                 alpha=0.7, color='green', edgecolor='black')
         ax3.axvline(self.stats['mean'], color='red', linestyle='--', linewidth=2, label=f"Mean: {self.stats['mean']:.3f}")
         ax3.axvline(self.stats['median'], color='blue', linestyle='--', linewidth=2, label=f"Median: {self.stats['median']:.3f}")
         ax3.set_xlabel('NDVI Value')
@@ -227,7 +771,16 @@ class NDVIHealthCalculator:
         
         # 6. NDVI boxplot
         ax6 = plt.subplot(2, 3, 6)
-        bp = ax6.boxplot(valid_ndvi, patch_artist=True, labels=['NDVI'])
+        iqr = self.stats['q3'] - self.stats['q1']
+        box = {
+            'label': 'NDVI',
+            'med': self.stats['median'],
+            'q1': self.stats['q1'],
+            'q3': self.stats['q3'],
+            'whislo': max(self.stats['min'], self.stats['q1'] - 1.5 * iqr),
+            'whishi': min(self.stats['max'], self.stats['q3'] + 1.5 * iqr)
+        }
+        bp = ax6.bxp([box], patch_artist=True, showfliers=False)
         bp['boxes'][0].set_facecolor('lightgreen')
         ax6.set_ylabel('NDVI Value')
         ax6.set_title('NDVI Statistical Summary', fontsize=14, fontweight='bold')
@@ -237,7 +790,7 @@ class NDVIHealthCalculator:
         
         # Save the figure
         output_path = self.output_dir / 'ndvi_analysis_report.png'
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
+        plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
         print(f"✅ Visualization saved: {output_path}")
         
         return fig
@@ -249,38 +802,121 @@ class NDVIHealthCalculator:
             
         # Save NDVI
         ndvi_path = self.output_dir / 'ndvi_result.tif'
-        with rasterio.open(
-            ndvi_path,
-            'w',
-            driver='GTiff',
-            height=self.ndvi.shape[0],
-            width=self.ndvi.shape[1],
-            count=1,
-            dtype=self.ndvi.dtype,
-            crs=self.metadata['crs'],
-            transform=self.metadata['transform']
-        ) as dst:
+        with rasterio.open(ndvi_path, 'w', **self._ndvi_profile()) as dst:
             dst.write(self.ndvi, 1)
+            build_overviews(dst, Resampling.average)
             
         # Save vegetation classification
         class_path = self.output_dir / 'vegetation_classification.tif'
-        with rasterio.open(
-            class_path,
-            'w',
-            driver='GTiff',
-            height=self.vegetation_class.shape[0],
-            width=self.vegetation_class.shape[1],
-            count=1,
-            dtype=self.vegetation_class.dtype,
-            crs=self.metadata['crs'],
-            transform=self.metadata['transform']
-        ) as dst:
+        with rasterio.open(class_path, 'w', **self._class_profile()) as dst:
             dst.write(self.vegetation_class, 1)
+            build_overviews(dst, Resampling.mode)
+            
+        self.ndvi_path = ndvi_path
+        self.class_path = class_path
             
         print(f"✅ Results saved:")
         print(f"   NDVI: {ndvi_path}")
         print(f"   Classification: {class_path}")
         
+    def zonal_statistics(self, fields_path, output_path=None,
+                         percentiles=(10, 25, 50, 75, 90), bins=200,
+                         block_size=1024, all_touched=False):
+        """
+        Per-field NDVI statistics for a polygon layer
+        
+        Field IDs are rasterized once into a uint32 label grid aligned to the
+        NDVI raster. One pass over NDVI blocks then accumulates per-field
+        count/sum/sum of squares with np.bincount and a per-field histogram
+        for approximate percentiles, instead of masking the raster per polygon.
+        
+        Args:
+            fields_path (str): Vector file with field polygons
+            output_path (str): .parquet for GeoParquet, anything else for CSV
+                (default: outputs/field_ndvi_stats.csv)
+            percentiles (tuple): Percentiles to report per field
+            bins (int): Histogram bins over [-1, 1] used for percentiles
+            block_size (int): Window edge length in pixels
+            all_touched (bool): Include every pixel touched by a polygon
+            
+        Returns:
+            GeoDataFrame: Fields with ndvi_* statistic columns
+        """
+        if self.ndvi is None and self.ndvi_path is None:
+            raise ValueError("NDVI not calculated. Call calculate_ndvi() first.")
+        
+        fields = gpd.read_file(fields_path)
+        if fields.crs is not None and self.metadata['crs'] is not None:
+            fields = fields.to_crs(self.metadata['crs'])
+        
+        # Label 0 is background; field i gets label i + 1
+        n_fields = len(fields)
+        has_geometry = (fields.geometry.notna() & ~fields.geometry.is_empty).to_numpy()
+        shapes = zip(fields.geometry[has_geometry], np.flatnonzero(has_geometry) + 1)
+        height, width = self.metadata['height'], self.metadata['width']
+        labels = rasterize(
+            shapes,
+            out_shape=(height, width),
+            transform=self.metadata['transform'],
+            fill=0,
+            all_touched=all_touched,
+            dtype='uint32'
+        )
+        
+        count = np.zeros(n_fields + 1, dtype=np.int64)
+        total = np.zeros(n_fields + 1)
+        total_sq = np.zeros(n_fields + 1)
+        histogram = np.zeros((n_fields + 1, bins), dtype=np.uint32)
+        
+        with ExitStack() as stack:
+            src = None
+            if self.ndvi is None:
+                src = stack.enter_context(rasterio.open(self.ndvi_path))
+            
+            for window in iter_windows(width, height, block_size):
+                slices = window.toslices()
+                ndvi = self.ndvi[slices] if src is None else src.read(1, window=window)
+                block_labels = labels[slices]
+                
+                valid = (block_labels > 0) & np.isfinite(ndvi)
+                field = block_labels[valid].astype(np.intp)
+                values = ndvi[valid].astype(np.float64)
+                if field.size == 0:
+                    continue
+                
+                count += np.bincount(field, minlength=n_fields + 1)
+                total += np.bincount(field, weights=values, minlength=n_fields + 1)
+                total_sq += np.bincount(field, weights=values * values, minlength=n_fields + 1)
+                
+                bin_index = ((values + 1.0) * (bins / 2.0)).astype(np.intp)
+                np.clip(bin_index, 0, bins - 1, out=bin_index)
+                keys, key_counts = np.unique(field * bins + bin_index, return_counts=True)
+                histogram.ravel()[keys] += key_counts.astype(np.uint32)
+        
+        # Drop the background row
+        count, total, total_sq, histogram = count[1:], total[1:], total_sq[1:], histogram[1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / count
+            std = np.sqrt(np.maximum(total_sq / count - mean ** 2, 0.0))
+        
+        edges = np.linspace(-1.0, 1.0, bins + 1)
+        quantiles = histogram_quantiles(histogram, edges, np.asarray(percentiles) / 100.0)
+        
+        fields['ndvi_count'] = count
+        fields['ndvi_mean'] = mean
+        fields['ndvi_std'] = std
+        for j, p in enumerate(percentiles):
+            fields[f"ndvi_p{p:g}"] = quantiles[:, j]
+        
+        output_path = Path(output_path) if output_path else self.output_dir / 'field_ndvi_stats.csv'
+        if output_path.suffix.lower() in ('.parquet', '.geoparquet'):
+            fields.to_parquet(output_path)
+        else:
+            fields.drop(columns=fields.geometry.name).to_csv(output_path, index=False)
+        
+        print(f"✅ Zonal statistics for {np.count_nonzero(count)}/{n_fields} fields saved: {output_path}")
+        return fields
+        
     def generate_report(self):
         """Generate a comprehensive JSON report"""
         report = {
@@ -291,53 +927,280 @@ class NDVIHealthCalculator:
             },
             'ndvi_statistics': self.stats,
             'vegetation_classification': self.class_stats,
+            'spectral_indices': self.index_stats,
             'metadata': {
                 'crs': str(self.metadata['crs']),
                 'bounds': list(self.metadata['bounds'])
             }
         }
         
-        report_path = self.output_dir / 'ndvi_health_report.json'
+        report_path = self.output_dir / REPORT_NAME
         with open(report_path, 'w') as f:
             json.dump(report, f, indent=2)
             
         print(f"✅ Report saved: {report_path}")
         return report
 
+def file_sha256(path, chunk_size=8 * 1024 * 1024):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def input_fingerprint(band_paths, use_hash=False):
+    """Size and mtime (or content hash) of every input file"""
+    fingerprint = {}
+    for band, path in sorted(band_paths.items()):
+        stat = os.stat(path)
+        entry = {'size': stat.st_size}
+        if use_hash:
+            entry['sha256'] = file_sha256(path)
+        else:
+            entry['mtime'] = stat.st_mtime
+        fingerprint[band] = entry
+    return fingerprint
+
+def load_scenes(manifest=None, pattern=None, red_token='B04', nir_token='B08'):
+    """
+    Build the scene list from a manifest and/or a glob of red band files
+    
+    The manifest is CSV (header: scene_id,red,nir[,blue,green,swir2]) or a
+    JSON list of objects with the same keys; relative paths are resolved
+    against the manifest location. For globs, the NIR path is derived by
+    replacing red_token with nir_token in the red file name.
+    """
+    scenes = []
+    
+    if manifest:
+        manifest = Path(manifest)
+        if manifest.suffix.lower() == '.json':
+            with open(manifest) as f:
+                rows = json.load(f)
+        else:
+            with open(manifest, newline='') as f:
+                rows = list(csv.DictReader(f))
+        
+        for row in rows:
+            scene = {'scene_id': row.get('scene_id') or Path(row['red']).parent.name}
+            for band in BAND_COLUMNS:
+                if row.get(band):
+                    scene[band] = str(manifest.parent / row[band])
+            scenes.append(scene)
+    
+    if pattern:
+        for red_path in sorted(glob.glob(pattern, recursive=True)):
+            red_path = Path(red_path)
+            if red_token not in red_path.name:
+                continue
+            nir_path = red_path.with_name(red_path.name.replace(red_token, nir_token))
+            scenes.append({
+                'scene_id': red_path.stem.replace(red_token, '').strip('_-.') or red_path.parent.name,
+                'red': str(red_path),
+                'nir': str(nir_path)
+            })
+    
+    # Scene IDs name the output folders, so they must be unique
+    seen = {}
+    for scene in scenes:
+        count = seen.get(scene['scene_id'], 0)
+        seen[scene['scene_id']] = count + 1
+        if count:
+            scene['scene_id'] = f"{scene['scene_id']}_{count}"
+    
+    return scenes
+
+def summarize_report(report):
+    """Flatten an NDVI report into one summary row"""
+    stats = report.get('ndvi_statistics', {})
+    row = {f"ndvi_{key}": stats.get(key) for key in ('mean', 'std', 'min', 'max', 'median')}
+    row['total_pixels'] = stats.get('total_pixels')
+    for class_name in CLASS_NAMES:
+        class_stats = report.get('vegetation_classification', {}).get(class_name, {})
+        row[f"pct_{class_name.lower().replace(' ', '_')}"] = class_stats.get('percentage', 0.0)
+    return row
+
+def process_scene(scene, options):
+    """
+    Run the full pipeline for one scene, skipping it when outputs are up to date
+    
+    Runs in worker processes, so it only takes and returns plain data.
+    """
+    started = time.time()
+    output_dir = Path(options['output_dir']) / scene['scene_id']
+    band_paths = {band: scene[band] for band in BAND_COLUMNS if band in scene}
+    summary = {'scene_id': scene['scene_id'], 'output_dir': str(output_dir)}
+    
+    try:
+        # Field polygons are inputs too: edits to them reprocess the scene
+        input_paths = dict(band_paths)
+        if options['parameters']['fields']:
+            input_paths['fields'] = options['parameters']['fields']
+        stamp = {
+            'inputs': input_fingerprint(input_paths, options['use_hash']),
+            'parameters': options['parameters'],
+            'plots': options['plots']
+        }
+        stamp_path = output_dir / STAMP_NAME
+        report_path = output_dir / REPORT_NAME
+        
+        if not options['force'] and stamp_path.exists() and report_path.exists():
+            with open(stamp_path) as f:
+                if json.load(f) == stamp:
+                    with open(report_path) as f:
+                        summary.update(summarize_report(json.load(f)))
+                    summary.update(status='skipped', elapsed_s=0.0)
+                    return summary
+        
+        # Drop the stamp first, so a run failing midway is never taken as up to date
+        output_dir.mkdir(parents=True, exist_ok=True)
+        stamp_path.unlink(missing_ok=True)
+        parameters = options['parameters']
+        calculator = NDVIHealthCalculator(
+            scene['red'], scene['nir'], output_dir,
+            class_thresholds=parameters['class_thresholds'],
+            extra_bands={band: path for band, path in band_paths.items() if band not in ('red', 'nir')}
+        )
+        
+        if parameters['windowed']:
+            calculator.calculate_ndvi_windowed(
+                parameters['block_size'], parameters['indices'], parameters['reflectance_scale']
+            )
+        else:
+            calculator.load_bands()
+            calculator.calculate_ndvi()
+            calculator.classify_vegetation()
+            calculator.save_results()
+        
+        if options['plots']:
+            plt.close(calculator.create_visualizations())
+        
+        if parameters['fields']:
+            calculator.zonal_statistics(parameters['fields'], block_size=parameters['block_size'])
+        
+        report = calculator.generate_report()
+        with open(stamp_path, 'w') as f:
+            json.dump(stamp, f, indent=2)
+        
+        summary.update(summarize_report(report))
+        summary['status'] = 'processed'
+        
+    except Exception as e:
+        summary.update(status='failed', error=str(e))
+    
+    summary['elapsed_s'] = round(time.time() - started, 2)
+    return summary
+
+def write_summary(rows, summary_path):
+    """Write the combined batch summary as JSON and CSV"""
+    summary_path = Path(summary_path)
+    summary_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    with open(summary_path.with_suffix('.json'), 'w') as f:
+        json.dump(rows, f, indent=2)
+    
+    columns = []
+    for row in rows:
+        columns.extend(key for key in row if key not in columns)
+    with open(summary_path.with_suffix('.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    
+    print(f"✅ Batch summary saved: {summary_path.with_suffix('.json')} / .csv")
+
+def run_batch(scenes, options, workers=1):
+    """Process scenes in a process pool and collect their summaries"""
+    rows = []
+    
+    if workers <= 1:
+        results = (process_scene(scene, options) for scene in scenes)
+        for summary in results:
+            rows.append(summary)
+            print(f"[{len(rows)}/{len(scenes)}] {summary['scene_id']}: {summary['status']}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_scene, scene, options) for scene in scenes]
+            for future in as_completed(futures):
+                summary = future.result()
+                rows.append(summary)
+                print(f"[{len(rows)}/{len(scenes)}] {summary['scene_id']}: {summary['status']}")
+    
+    rows.sort(key=lambda row: row['scene_id'])
+    return rows
+
 def main():
     """
-    Main function to run NDVI analysis
-    Replace with your actual file paths
+    Run NDVI analysis for one scene or a batch of scenes
     """
+    parser = argparse.ArgumentParser(description='NDVI health analysis for one or many scenes')
+    parser.add_argument('--red', help='Red band raster (single scene)')
+    parser.add_argument('--nir', help='NIR band raster (single scene)')
+    parser.add_argument('--manifest', help='CSV/JSON manifest with scene_id,red,nir[,blue,green,swir2]')
+    parser.add_argument('--glob', dest='pattern', help='Glob of red band files, e.g. "scenes/**/*B04*.tif"')
+    parser.add_argument('--red-token', default='B04', help='Red band token in globbed file names')
+    parser.add_argument('--nir-token', default='B08', help='NIR band token replacing --red-token')
+    parser.add_argument('--output-dir', default='outputs', help='Output root (one folder per scene)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--windowed', action='store_true', help='Block-wise processing in constant memory')
+    parser.add_argument('--block-size', type=int, default=1024, help='Window size for block-wise processing')
+    parser.add_argument('--indices', nargs='*', default=[], choices=sorted(SPECTRAL_INDICES),
+                        help='Additional spectral indices (requires --windowed)')
+    parser.add_argument('--reflectance-scale', type=float, default=1.0,
+                        help='Factor converting band values to reflectance')
+    parser.add_argument('--thresholds', type=float, nargs=3, default=list(CLASS_THRESHOLDS),
+                        help='NDVI thresholds between vegetation classes')
+    parser.add_argument('--fields', help='Field polygons for per-field zonal statistics')
+    parser.add_argument('--no-plots', action='store_true', help='Skip the PNG report')
+    parser.add_argument('--force', action='store_true', help='Reprocess scenes that are up to date')
+    parser.add_argument('--hash', action='store_true',
+                        help='Detect changed inputs by content hash instead of mtime')
+    parser.add_argument('--summary', help='Batch summary path (default: <output-dir>/batch_summary)')
+    args = parser.parse_args()
+    
+    if args.indices and not args.windowed:
+        parser.error("--indices requires --windowed (only the block-wise engine computes extra indices)")
     
-    # Example usage
     print("🌱 NDVI Health Index Calculator")
     print("   HaritaHive GeoProcessing Lab")
     print("="*50)
     
-    # Initialize calculator (replace with your file paths)
-    red_band = "path/to/your/red_band.tif"
-    nir_band = "path/to/your/nir_band.tif"
+    scenes = load_scenes(args.manifest, args.pattern, args.red_token, args.nir_token)
+    if args.red and args.nir:
+        scenes.append({'scene_id': Path(args.red).stem, 'red': args.red, 'nir': args.nir})
     
-    try:
-        calculator = NDVIHealthCalculator(red_band, nir_band)
-        
-        # Run analysis pipeline
-        calculator.load_bands()
-        calculator.calculate_ndvi()
-        calculator.classify_vegetation()
-        calculator.create_visualizations()
-        calculator.save_results()
-        calculator.generate_report()
-        
-        print("\n🎉 Analysis completed successfully!")
-        print(f"   Check the 'outputs' folder for results")
-        
-    except FileNotFoundError:
-        print("❌ Input files not found. Please update file paths in the script.")
-        print("   This is a demo script - replace with your actual data paths.")
-    except Exception as e:
-        print(f"❌ Error during analysis: {str(e)}")
+    if not scenes:
+        parser.error("No scenes given. Use --red/--nir, --manifest or --glob.")
+    
+    options = {
+        'output_dir': args.output_dir,
+        'plots': not args.no_plots,
+        'force': args.force,
+        'use_hash': args.hash,
+        # Stored in the up-to-date stamp, so changing them reprocesses scenes
+        'parameters': {
+            'windowed': args.windowed,
+            'block_size': args.block_size,
+            'indices': args.indices,
+            'reflectance_scale': args.reflectance_scale,
+            'class_thresholds': args.thresholds,
+            'fields': args.fields
+        }
+    }
+    
+    print(f"Processing {len(scenes)} scene(s) with {args.workers} worker(s)")
+    rows = run_batch(scenes, options, max(1, min(args.workers or 1, len(scenes))))
+    write_summary(rows, args.summary or Path(args.output_dir) / 'batch_summary')
+    
+    failed = [row for row in rows if row['status'] == 'failed']
+    skipped = sum(row['status'] == 'skipped' for row in rows)
+    print(f"\n🎉 {len(rows) - len(failed) - skipped} processed, {skipped} up to date, {len(failed)} failed")
+    for row in failed:
+        print(f"❌ {row['scene_id']}: {row['error']}")
+    
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
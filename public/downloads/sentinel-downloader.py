@@ -8,126 +8,731 @@ Author: HaritaHive Team
 """
 
 from sentinelsat import SentinelAPI, read_geojson, geojson_to_wkt
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
 import argparse
+import hashlib
+import json
 import os
-from datetime import datetime, timedelta
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
 import zipfile
 import rasterio
+from rasterio.enums import Resampling
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.warp import transform_geom
+from rasterio.windows import Window, from_bounds
+import requests
 import numpy as np
 
-class Sentinel2Downloader:
-    def __init__(self, username, password):
-        self.api = SentinelAPI(username, password, 'https://scihub.copernicus.eu/dhus')
+try:
+    from shapely import wkt as shapely_wkt
+except ImportError:
+    shapely_wkt = None
+
+DEFAULT_API_URL = 'https://scihub.copernicus.eu/dhus'
+STATE_FILE = '.download_state.json'
+CHUNK_SIZE = 1024 * 1024
+CATALOG_FILE = 'catalog.sqlite'
+PRODUCT_TYPE = 'S2MSI1C'
+RGB_BANDS = ('B02', 'B03', 'B04')
+
+def band_pattern(bands):
+    """Regex matching the 10 m (or single-resolution L1C) JP2 of the given bands inside a SAFE product"""
+    codes = '|'.join(re.escape(band) for band in bands)
+    return re.compile(rf'IMG_DATA/(?:R10m/)?[^/]*_({codes})(?:_10m)?\.jp2$')
+
+def find_band_files(product_path, bands=RGB_BANDS):
+    """
+    Map band code -> raster path for a product
     
-    def search_images(self, aoi_file, start_date, end_date, cloud_cover=20):
-        """Search for Sentinel-2 images"""
+    Works on an extracted SAFE directory and on a product zip, whose
+    members are addressed through GDAL's /vsizip/ without extracting them.
+    """
+    pattern = band_pattern(bands)
+    
+    if os.path.isfile(product_path) and zipfile.is_zipfile(product_path):
+        with zipfile.ZipFile(product_path) as zf:
+            names = zf.namelist()
+        prefix = f"/vsizip/{os.path.abspath(product_path)}/"
+        return {match.group(1): prefix + name for name in names if (match := pattern.search(name))}
+    
+    band_files = {}
+    for root, dirs, files in os.walk(product_path):
+        for file in files:
+            path = os.path.join(root, file)
+            match = pattern.search(path.replace(os.sep, '/'))
+            if match:
+                band_files[match.group(1)] = path
+    return band_files
+
+def file_md5(path, chunk_size=8 * CHUNK_SIZE):
+    """MD5 hex digest of a file, read in chunks"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def wkt_bounds(wkt):
+    """(min_x, max_x, min_y, max_y) of all coordinates in a WKT geometry"""
+    coords = np.array(re.findall(r'(-?[\d.]+(?:[eE][-+]?\d+)?)\s+(-?[\d.]+(?:[eE][-+]?\d+)?)', wkt), dtype=float)
+    return coords[:, 0].min(), coords[:, 0].max(), coords[:, 1].min(), coords[:, 1].max()
+
+def uncovered_ranges(start, end, covered):
+    """Sub-ranges of the inclusive day range [start, end] not inside any covered (start, end) range"""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in sorted(covered):
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start - timedelta(days=1)))
+        cursor = max(cursor, covered_end + timedelta(days=1))
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+def geojson_geometries(geojson):
+    """List of the geometries in a GeoJSON FeatureCollection, Feature or geometry"""
+    if geojson['type'] == 'FeatureCollection':
+        return [feature['geometry'] for feature in geojson['features']]
+    if geojson['type'] == 'Feature':
+        return [geojson['geometry']]
+    return [geojson]
+
+class AOIClipper:
+    """
+    Cuts an area of interest out of Sentinel-2 products as small multi-band GeoTIFFs
+    
+    Only the band windows intersecting the AOI are read, from extracted
+    products or directly from product zips (/vsizip/). The AOI is reprojected
+    once per product CRS and reused for every band and product in that zone.
+    """
+    
+    def __init__(self, geometries, bands=RGB_BANDS, mask=True):
+        """
+        Args:
+            geometries: AOI GeoJSON geometries (WGS84)
+            bands: Band codes stacked in the output, in order
+            mask: Set pixels outside the AOI polygons to 0 (nodata)
+        """
+        self.geometries = geometries
+        self.bands = tuple(bands)
+        self.mask = mask
+        self._projected = {}
+    
+    def projected(self, crs):
+        """AOI geometries in the given CRS (cached)"""
+        key = crs.to_string()
+        if key not in self._projected:
+            self._projected[key] = [transform_geom('EPSG:4326', crs, geom) for geom in self.geometries]
+        return self._projected[key]
+    
+    def clip_product(self, product_path, output_path):
+        """Write the AOI part of a product's bands to output_path; returns None if they do not overlap"""
         
-        # Read area of interest
-        footprint = geojson_to_wkt(read_geojson(aoi_file))
+        band_files = find_band_files(product_path, self.bands)
+        missing = [band for band in self.bands if band not in band_files]
+        if missing:
+            print(f"Could not find bands {', '.join(missing)} in {product_path}")
+            return None
+        
+        with ExitStack() as stack:
+            sources = [stack.enter_context(rasterio.open(band_files[band])) for band in self.bands]
+            
+            # Output grid: the AOI window of the finest band
+            reference = min(sources, key=lambda src: src.res[0])
+            geometries = self.projected(reference.crs)
+            try:
+                window = geometry_window(reference, geometries)
+            except WindowError:
+                print(f"AOI does not intersect {product_path}")
+                return None
+            
+            shape = (int(window.height), int(window.width))
+            transform = reference.window_transform(window)
+            window_bounds = reference.window_bounds(window)
+            
+            stack_data = np.empty((len(sources),) + shape, dtype=reference.dtypes[0])
+            for i, src in enumerate(sources):
+                # Coarser bands are resampled onto the output grid
+                stack_data[i] = src.read(
+                    1, window=from_bounds(*window_bounds, transform=src.transform),
+                    out_shape=shape, resampling=Resampling.nearest
+                )
+        
+        if self.mask:
+            outside = geometry_mask(geometries, out_shape=shape, transform=transform)
+            stack_data[:, outside] = 0
+        
+        profile = {
+            'driver': 'GTiff',
+            'width': shape[1],
+            'height': shape[0],
+            'count': len(self.bands),
+            'dtype': stack_data.dtype,
+            'crs': reference.crs,
+            'transform': transform,
+            'nodata': 0,
+            'compress': 'deflate',
+            'predictor': 2
+        }
+        with rasterio.open(output_path, 'w', **profile) as dst:
+            dst.write(stack_data)
+            dst.descriptions = self.bands
+        
+        print(f"AOI clip saved to {output_path}")
+        return output_path
+
+_worker_clipper = None
+
+def _init_clip_worker(clipper):
+    """Process pool initializer: keep one AOIClipper (and its reprojection cache) per worker"""
+    global _worker_clipper
+    _worker_clipper = clipper
+
+def _clip_in_worker(product_path, output_path):
+    return _worker_clipper.clip_product(product_path, output_path)
+
+class ProductCatalog:
+    """
+    Local SQLite catalog of hub search results
+    
+    Products are stored with their footprint bounding box in an R-tree, and
+    the date ranges already queried are recorded per AOI and cloud limit, so
+    repeated or overlapping searches only need the hub for the missing days.
+    """
+    
+    def __init__(self, path, refresh_days=3):
+        """
+        Args:
+            path: SQLite database file
+            refresh_days: Most recent days never treated as covered (products are
+                          still being ingested by the hub)
+        """
+        self.path = path
+        self.refresh_days = refresh_days
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS products (
+                pk INTEGER PRIMARY KEY,
+                id TEXT UNIQUE,
+                title TEXT,
+                sensing_time TEXT,
+                cloud_cover REAL,
+                footprint TEXT,
+                info TEXT
+            );
+            CREATE INDEX IF NOT EXISTS products_time ON products (sensing_time);
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_rtree USING rtree (pk, min_x, max_x, min_y, max_y);
+            CREATE TABLE IF NOT EXISTS coverage (
+                aoi TEXT,
+                max_cloud_cover REAL,
+                start_date TEXT,
+                end_date TEXT
+            );
+        """)
+    
+    @staticmethod
+    def aoi_key(footprint):
+        return hashlib.sha1(f"{PRODUCT_TYPE}:{footprint}".encode()).hexdigest()
+    
+    def missing_ranges(self, footprint, start, end, cloud_cover):
+        """Date ranges within [start, end] not yet queried for this AOI at this (or a looser) cloud limit"""
+        rows = self.db.execute(
+            "SELECT start_date, end_date FROM coverage WHERE aoi = ? AND max_cloud_cover >= ?",
+            (self.aoi_key(footprint), cloud_cover)
+        ).fetchall()
+        covered = [(date.fromisoformat(s), date.fromisoformat(e)) for s, e in rows]
+        return uncovered_ranges(start, end, covered)
+    
+    def add(self, products, footprint, start, end, cloud_cover):
+        """Store hub query results and record [start, end] as covered for the AOI"""
+        with self.db:
+            for product_id, info in products.items():
+                sensing_time = info.get('beginposition', '')
+                if isinstance(sensing_time, datetime):
+                    sensing_time = sensing_time.isoformat()
+                self.db.execute("DELETE FROM products_rtree WHERE pk IN "
+                                "(SELECT pk FROM products WHERE id = ?)", (product_id,))
+                cursor = self.db.execute(
+                    "INSERT OR REPLACE INTO products (id, title, sensing_time, cloud_cover, footprint, info) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (product_id, info['title'], sensing_time, info.get('cloudcoverpercentage'),
+                     info.get('footprint', ''), json.dumps(info, default=str))
+                )
+                if info.get('footprint'):
+                    self.db.execute("INSERT INTO products_rtree VALUES (?, ?, ?, ?, ?)",
+                                    (cursor.lastrowid, *wkt_bounds(info['footprint'])))
+            
+            end = min(end, date.today() - timedelta(days=self.refresh_days))
+            if start <= end:
+                self.db.execute("INSERT INTO coverage VALUES (?, ?, ?, ?)",
+                                (self.aoi_key(footprint), cloud_cover, start.isoformat(), end.isoformat()))
+    
+    def search(self, footprint, start, end, cloud_cover):
+        """Products intersecting the footprint, sensed within [start, end], with cloud cover <= limit"""
+        min_x, max_x, min_y, max_y = wkt_bounds(footprint)
+        rows = self.db.execute(
+            "SELECT p.id, p.footprint, p.info FROM products p "
+            "JOIN products_rtree r ON r.pk = p.pk "
+            "WHERE r.max_x >= ? AND r.min_x <= ? AND r.max_y >= ? AND r.min_y <= ? "
+            "AND p.sensing_time >= ? AND p.sensing_time < ? AND p.cloud_cover <= ? "
+            "ORDER BY p.sensing_time",
+            (min_x, max_x, min_y, max_y, start.isoformat(),
+             (end + timedelta(days=1)).isoformat(), cloud_cover)
+        ).fetchall()
         
-        # Search for images
-        products = self.api.query(
+        # Exact footprint test when shapely is available (the R-tree only compares boxes)
+        aoi = shapely_wkt.loads(footprint) if shapely_wkt is not None else None
+        return OrderedDict(
+            (product_id, json.loads(info))
+            for product_id, product_footprint, info in rows
+            if aoi is None or aoi.intersects(shapely_wkt.loads(product_footprint))
+        )
+
+class DownloadState:
+    """Per-product download status persisted as JSON, safe to update from worker threads"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.jobs = json.load(f)
+    
+    def get(self, product_id):
+        with self.lock:
+            return dict(self.jobs.get(product_id, {}))
+    
+    def is_done(self, product_id):
+        return self.get(product_id).get('status') == 'done'
+    
+    def update(self, product_id, **fields):
+        with self.lock:
+            self.jobs.setdefault(product_id, {}).update(fields, updated=datetime.now().isoformat())
+            
+            # Write-then-rename so an interrupted save never corrupts the state
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.jobs, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+def estimate_percentiles(src, percentiles=(2, 98), max_size=2048):
+    """
+    Estimate percentiles of a band's valid (> 0) pixels from a decimated read
+    
+    The band is read at most max_size pixels on its long side (GDAL serves
+    this from overviews when the file has them) and the percentiles are
+    taken from the cumulative histogram instead of a full sort.
+    """
+    scale = max(1.0, max(src.width, src.height) / max_size)
+    out_shape = (max(1, round(src.height / scale)), max(1, round(src.width / scale)))
+    data = src.read(1, out_shape=out_shape, resampling=Resampling.nearest)
+    values = data[data > 0]
+    if values.size == 0:
+        return [0.0] * len(percentiles)
+    
+    if np.issubdtype(values.dtype, np.integer):
+        # Exact per-value histogram for integer (DN) bands
+        counts = np.bincount(values.ravel())
+        centers = np.arange(len(counts), dtype=np.float64)
+    else:
+        counts, edges = np.histogram(values, bins=4096)
+        centers = 0.5 * (edges[:-1] + edges[1:])
+    
+    cumulative = np.cumsum(counts)
+    ranks = np.asarray(percentiles, dtype=np.float64) / 100.0 * cumulative[-1]
+    return [float(centers[i]) for i in np.searchsorted(cumulative, ranks).clip(0, len(centers) - 1)]
+
+def create_rgb_composite(safe_dir, output_path, window_size=1024, max_sample_size=2048):
+    """
+    Create RGB composite from Sentinel-2 bands (extracted SAFE directory or product zip)
+    
+    Two passes per band: 2/98 percentiles are estimated from a decimated
+    read, then the band is stretched and written as uint8 window by window.
+    The three bands run in parallel threads, so only a few windows are in
+    memory at any time.
+    
+    Args:
+        safe_dir: Extracted product directory or product zip
+        output_path: Output GeoTIFF
+        window_size: Pixels per processing window side (multiple of 512)
+        max_sample_size: Long side of the decimated read used for the percentiles
+    """
+    
+    # Band mapping (10m resolution)
+    band_files = find_band_files(safe_dir, RGB_BANDS)
+    bands = [band_files.get(code) for code in ('B04', 'B03', 'B02')]  # red, green, blue
+    
+    if None in bands:
+        print("Could not find all RGB bands")
+        return None
+    
+    with rasterio.open(bands[0]) as red_src:
+        profile = red_src.profile
+        width, height = red_src.width, red_src.height
+    
+    # Band-interleaved tiles so each band thread writes independent blocks
+    profile.update(
+        driver='GTiff',
+        dtype=rasterio.uint8,
+        count=3,
+        compress='lzw',
+        tiled=True,
+        blockxsize=512,
+        blockysize=512,
+        interleave='band',
+        nodata=None
+    )
+    
+    windows = [
+        Window(col, row, min(window_size, width - col), min(window_size, height - row))
+        for row in range(0, height, window_size)
+        for col in range(0, width, window_size)
+    ]
+    write_lock = threading.Lock()
+    
+    def stretch_band(band_index, band_path):
+        with rasterio.open(band_path) as src:
+            # Pass 1: 2-98 percentile stretch limits
+            p2, p98 = estimate_percentiles(src, (2, 98), max_sample_size)
+            scale = 255.0 / max(p98 - p2, 1e-6)
+            
+            # Pass 2: stretch and write window by window, reusing this band's buffers
+            values = np.empty(window_size * window_size, dtype=np.float32)
+            stretched = np.empty(window_size * window_size, dtype=np.uint8)
+            for window in windows:
+                shape = (window.height, window.width)
+                n = window.height * window.width
+                band = values[:n].reshape(shape)
+                src.read(1, window=window, out=band)
+                band -= p2
+                band *= scale
+                np.clip(band, 0, 255, out=band)
+                out = stretched[:n].reshape(shape)
+                np.copyto(out, band, casting='unsafe')
+                with write_lock:
+                    dst.write(out, band_index, window=window)
+    
+    # Write RGB composite
+    with rasterio.open(output_path, 'w', **profile) as dst:
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(stretch_band, (1, 2, 3), bands))
+    
+    print(f"RGB composite saved to {output_path}")
+    return output_path
+
+class Sentinel2Downloader:
+    def __init__(self, username, password, api_url=DEFAULT_API_URL, catalog_path=None):
+        self.api = SentinelAPI(username, password, api_url)
+        self.catalog = ProductCatalog(catalog_path) if catalog_path else None
+    
+    def query_hub(self, footprint, start, end, cloud_cover):
+        """Query the hub for products sensed from the start of day start to the end of day end"""
+        return self.api.query(
             footprint,
-            date=(start_date, end_date),
+            date=(start, datetime(end.year, end.month, end.day, 23, 59, 59, 999000)),
             platformname='Sentinel-2',
             cloudcoverpercentage=(0, cloud_cover),
-            producttype='S2MSI1C'
+            producttype=PRODUCT_TYPE
         )
+    
+    def search_images(self, aoi_file, start_date, end_date, cloud_cover=20):
+        """
+        Search for Sentinel-2 images
+        
+        With a catalog, only the days not covered by earlier searches of the
+        same AOI are queried on the hub; the result is read from the catalog.
+        Dates are inclusive 'YYYY-MM-DD' strings.
+        """
+        
+        # Read area of interest
+        footprint = geojson_to_wkt(read_geojson(aoi_file))
+        start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        
+        if self.catalog is None:
+            # Search for images
+            products = self.query_hub(footprint, start, end, cloud_cover)
+            print(f"Found {len(products)} Sentinel-2 images")
+            return products
         
+        for gap_start, gap_end in self.catalog.missing_ranges(footprint, start, end, cloud_cover):
+            print(f"Querying hub for {gap_start} to {gap_end}")
+            products = self.query_hub(footprint, gap_start, gap_end, cloud_cover)
+            self.catalog.add(products, footprint, gap_start, gap_end, cloud_cover)
+        
+        products = self.catalog.search(footprint, start, end, cloud_cover)
         print(f"Found {len(products)} Sentinel-2 images")
         return products
     
-    def download_images(self, products, download_dir):
-        """Download images"""
+    def fetch_product(self, product_id, download_dir, retries=3):
+        """
+        Download one product zip, resuming partial files and verifying the MD5
         
-        os.makedirs(download_dir, exist_ok=True)
+        Data is written to '<title>.zip.incomplete' and continued with an HTTP
+        Range request after interruptions; the file is renamed to '<title>.zip'
+        only once its checksum matches the hub's.
         
-        for product_id, product_info in products.items():
-            print(f"Downloading {product_info['title']}")
-            
+        Returns:
+            Path of the verified zip file
+        """
+        odata = self.api.get_product_odata(product_id)
+        zip_path = os.path.join(download_dir, f"{odata['title']}.zip")
+        if os.path.exists(zip_path):
+            return zip_path
+        
+        part_path = zip_path + '.incomplete'
+        for attempt in range(1, retries + 1):
             try:
-                self.api.download(product_id, download_dir)
-                
-                # Extract zip file
-                zip_path = os.path.join(download_dir, f"{product_info['title']}.zip")
-                if os.path.exists(zip_path):
-                    extract_dir = os.path.join(download_dir, product_info['title'])
-                    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                        zip_ref.extractall(extract_dir)
-                    
-                    # Remove zip file to save space
-                    os.remove(zip_path)
-                    print(f"Extracted to {extract_dir}")
-                    
-            except Exception as e:
-                print(f"Error downloading {product_info['title']}: {e}")
+                self._fetch_remaining(odata['url'], part_path)
+                break
+            except (requests.RequestException, OSError) as e:
+                if attempt == retries:
+                    raise
+                print(f"Retrying {odata['title']} ({attempt}/{retries}): {e}")
+                time.sleep(2 ** attempt)
+        
+        md5 = file_md5(part_path)
+        if odata.get('md5') and md5.lower() != odata['md5'].lower():
+            os.remove(part_path)
+            raise IOError(f"MD5 mismatch for {odata['title']} (expected {odata['md5']}, got {md5})")
+        
+        os.replace(part_path, zip_path)
+        return zip_path
+    
+    def _fetch_remaining(self, url, part_path):
+        """Append the bytes missing from part_path (restarts if the server ignores Range)"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        
+        with self.api.session.get(url, headers=headers, stream=True, timeout=self.api.timeout) as response:
+            if response.status_code == 416:
+                # Nothing left to fetch
+                return
+            response.raise_for_status()
+            
+            mode = 'ab' if response.status_code == 206 else 'wb'
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+    
+    def extract_product(self, zip_path, download_dir, bands=RGB_BANDS):
+        """
+        Extract a product zip next to it and remove the zip; returns the extract directory
+        
+        Args:
+            bands: Band codes whose JP2s are extracted (None extracts the whole product)
+        """
+        
+        title = os.path.splitext(os.path.basename(zip_path))[0]
+        extract_dir = os.path.join(download_dir, title)
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            members = zip_ref.namelist()
+            if bands is not None:
+                pattern = band_pattern(bands)
+                members = [name for name in members if pattern.search(name)]
+                if len(members) < len(bands):
+                    print(f"Warning: only {len(members)} of bands {', '.join(bands)} found in {title}")
+            zip_ref.extractall(extract_dir, members=members)
+        
+        # Remove zip file to save space
+        os.remove(zip_path)
+        print(f"Extracted to {extract_dir}")
+        return extract_dir
+    
+    def download_product(self, product_id, product_info, download_dir, state,
+                         bands=RGB_BANDS, keep_zip=False):
+        """
+        Download and extract one product, recording its progress in the job state
+        
+        Returns:
+            Extract directory, or the zip path when keep_zip is set (bands are then
+            read in place through /vsizip/)
+        """
+        
+        title = product_info['title']
+        print(f"Downloading {title}")
+        state.update(product_id, title=title, status='downloading', error=None)
+        
+        try:
+            path = self.fetch_product(product_id, download_dir)
+            if not keep_zip:
+                path = self.extract_product(path, download_dir, bands)
+        except Exception as e:
+            state.update(product_id, status='failed', error=str(e))
+            raise
+        
+        state.update(product_id, status='done', path=path)
+        return path
+    
+    def download_images(self, products, download_dir, max_workers=4, bands=RGB_BANDS, keep_zip=False):
+        """
+        Download images concurrently
+        
+        Products are fetched by a bounded thread pool with resumable,
+        checksum-verified transfers. Progress is kept in download_dir/.download_state.json,
+        so products completed by an earlier run are skipped. Only the JP2s of
+        the requested bands are extracted (all files if bands is None), or
+        nothing at all with keep_zip.
+        
+        Returns:
+            Dict of product id -> extract directory (or zip) for the products now available
+        """
+        
+        os.makedirs(download_dir, exist_ok=True)
+        state = DownloadState(os.path.join(download_dir, STATE_FILE))
+        
+        completed = {
+            product_id: state.get(product_id)['path']
+            for product_id in products if state.is_done(product_id)
+        }
+        if completed:
+            print(f"Skipping {len(completed)} products downloaded by a previous run")
+        
+        pending = {pid: info for pid, info in products.items() if pid not in completed}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.download_product, product_id, product_info, download_dir, state,
+                                bands, keep_zip): product_id
+                for product_id, product_info in pending.items()
+            }
+            for future in as_completed(futures):
+                product_id = futures[future]
+                try:
+                    completed[product_id] = future.result()
+                except Exception as e:
+                    print(f"Error downloading {products[product_id]['title']}: {e}")
+        
+        failed = len(products) - len(completed)
+        if failed:
+            print(f"{failed} products failed; rerun to resume them")
+        
+        return completed
     
     def create_rgb_composite(self, safe_dir, output_path):
-        """Create RGB composite from Sentinel-2 bands"""
+        """Create RGB composite from Sentinel-2 bands (extracted SAFE directory or product zip)"""
+        return create_rgb_composite(safe_dir, output_path)
+    
+    def run_pipeline(self, products, download_dir, download_workers=4, composite_workers=2,
+                     bands=RGB_BANDS, keep_zip=False, queue_size=None, clipper=None):
+        """
+        Download products and build their RGB composites (or AOI clips) as one pipeline
         
-        # Find band files
-        img_dir = None
-        for root, dirs, files in os.walk(safe_dir):
-            if 'IMG_DATA' in root:
-                img_dir = root
-                break
+        Download threads (network stage) feed a bounded queue that is drained
+        by a process pool (CPU stage), so each product is composited as soon
+        as it lands while the next ones are still downloading. When
+        compositing falls behind, the full queue pauses the downloads instead
+        of piling up products on disk. Products whose output is already
+        recorded in the job state are neither downloaded nor processed again.
+        If a worker process dies, the remaining downloads are skipped and the
+        pipeline returns what it finished.
         
-        if not img_dir:
-            print("Could not find IMG_DATA directory")
-            return
-        
-        # Band mapping (10m resolution)
-        bands = {}
-        for file in os.listdir(img_dir):
-            if file.endswith('.jp2'):
-                if 'B02' in file:  # Blue
-                    bands['blue'] = os.path.join(img_dir, file)
-                elif 'B03' in file:  # Green
-                    bands['green'] = os.path.join(img_dir, file)
-                elif 'B04' in file:  # Red
-                    bands['red'] = os.path.join(img_dir, file)
-        
-        if len(bands) != 3:
-            print("Could not find all RGB bands")
-            return
-        
-        # Read and stack bands
-        with rasterio.open(bands['red']) as red_src:
-            red = red_src.read(1).astype(np.float32)
-            profile = red_src.profile
-        
-        with rasterio.open(bands['green']) as green_src:
-            green = green_src.read(1).astype(np.float32)
-        
-        with rasterio.open(bands['blue']) as blue_src:
-            blue = blue_src.read(1).astype(np.float32)
-        
-        # Normalize to 0-255
-        def normalize_band(band):
-            # 2-98 percentile stretch
-            p2, p98 = np.percentile(band[band > 0], [2, 98])
-            band_norm = np.clip((band - p2) / (p98 - p2) * 255, 0, 255)
-            return band_norm.astype(np.uint8)
-        
-        red_norm = normalize_band(red)
-        green_norm = normalize_band(green)
-        blue_norm = normalize_band(blue)
-        
-        # Stack bands
-        rgb = np.stack([red_norm, green_norm, blue_norm])
-        
-        # Update profile
-        profile.update(
-            dtype=rasterio.uint8,
-            count=3,
-            compress='lzw'
-        )
+        Args:
+            download_workers: Concurrent downloads
+            composite_workers: Concurrent composites (processes)
+            queue_size: Downloaded products waiting for compositing (default: 2 * composite_workers)
+            clipper: AOIClipper; writes '<title>_AOI.tif' clips instead of RGB composites
         
-        # Write RGB composite
-        with rasterio.open(output_path, 'w', **profile) as dst:
-            dst.write(rgb)
+        Returns:
+            Dict of product id -> RGB composite (or AOI clip) path
+        """
+        
+        if clipper is None:
+            task, suffix, state_key = create_rgb_composite, '_RGB.tif', 'composite'
+            initializer, initargs = None, ()
+        else:
+            # The clipper lives in each worker, so its reprojected AOI is reused across products
+            task, suffix, state_key = _clip_in_worker, '_AOI.tif', 'clip'
+            initializer, initargs = _init_clip_worker, (clipper,)
         
-        print(f"RGB composite saved to {output_path}")
+        os.makedirs(download_dir, exist_ok=True)
+        state = DownloadState(os.path.join(download_dir, STATE_FILE))
+        ready = queue.Queue(maxsize=queue_size or 2 * composite_workers)
+        cpu_slots = threading.Semaphore(composite_workers)
+        stop = threading.Event()
+        
+        def output_path(product_id):
+            return os.path.join(download_dir, f"{products[product_id]['title']}{suffix}")
+        
+        def task_done(future):
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                stop.set()
+            cpu_slots.release()
+        
+        def produce(product_id, product_info):
+            path = None
+            try:
+                job = state.get(product_id)
+                output = output_path(product_id)
+                if job.get(state_key) == output and os.path.exists(output):
+                    # Already processed: no need for the product itself
+                    path = output
+                elif job.get('status') == 'done' and os.path.exists(job['path']):
+                    path = job['path']
+                elif not stop.is_set():
+                    path = self.download_product(product_id, product_info, download_dir, state,
+                                                 bands, keep_zip)
+            except Exception as e:
+                print(f"Error downloading {product_info['title']}: {e}")
+            # Blocks while the compositing stage is saturated
+            ready.put((product_id, path))
+        
+        composites = {}
+        with ThreadPoolExecutor(max_workers=download_workers) as network, \
+                ProcessPoolExecutor(max_workers=composite_workers, initializer=initializer,
+                                    initargs=initargs) as cpu:
+            for product_id, product_info in products.items():
+                network.submit(produce, product_id, product_info)
+            
+            # Every product is taken off the queue, even after a failure, so producers never block
+            jobs = {}
+            for _ in range(len(products)):
+                cpu_slots.acquire()
+                product_id, path = ready.get()
+                
+                rgb_path = output_path(product_id)
+                if path is None or path == rgb_path or stop.is_set():
+                    cpu_slots.release()
+                    if path == rgb_path:
+                        composites[product_id] = rgb_path
+                    continue
+                
+                try:
+                    future = cpu.submit(task, path, rgb_path)
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. killed for memory); stop downloading and drain the queue
+                    print(f"Compositing stopped, worker process failed: {e}")
+                    stop.set()
+                    cpu_slots.release()
+                    continue
+                future.add_done_callback(task_done)
+                jobs[future] = product_id
+            
+            for future in as_completed(jobs):
+                product_id = jobs[future]
+                try:
+                    rgb_path = future.result()
+                except Exception as e:
+                    print(f"Error compositing {products[product_id]['title']}: {e}")
+                    continue
+                if rgb_path:
+                    composites[product_id] = rgb_path
+                    state.update(product_id, **{state_key: rgb_path})
+        
+        print(f"Created {len(composites)} of {len(products)} {'AOI clips' if clipper else 'RGB composites'}")
+        return composites
 
 def main():
     parser = argparse.ArgumentParser(description='Download and preprocess Sentinel-2 imagery')
@@ -138,12 +743,34 @@ def main():
     parser.add_argument('--end-date', required=True, help='End date (YYYY-MM-DD)')
     parser.add_argument('--cloud-cover', type=int, default=20, help='Maximum cloud cover percentage')
     parser.add_argument('--download-dir', default='sentinel2_data', help='Download directory')
-    parser.add_argument('--create-rgb', action='store_true', help='Create RGB composites')
+    parser.add_argument('--api-url', default=DEFAULT_API_URL, help='Data hub API URL')
+    parser.add_argument('--catalog',
+                       help=f'SQLite product catalog caching searches (default: <download-dir>/{CATALOG_FILE})')
+    parser.add_argument('--no-catalog', action='store_true', help='Always query the hub')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent downloads')
+    parser.add_argument('--composite-workers', type=int, default=2,
+                       help='Concurrent RGB composites or AOI clips (processes)')
+    parser.add_argument('--queue-size', type=int,
+                       help='Downloaded products allowed to wait for compositing '
+                            '(default: twice the composite workers)')
+    outputs = parser.add_mutually_exclusive_group()
+    outputs.add_argument('--create-rgb', action='store_true', help='Create RGB composites')
+    outputs.add_argument('--clip-aoi', action='store_true',
+                        help='Write AOI-clipped stacks of --bands per product instead of full tiles')
+    parser.add_argument('--bands', nargs='+', default=list(RGB_BANDS),
+                       help='Band JP2s extracted from each product (default: B02 B03 B04)')
+    parser.add_argument('--all-bands', action='store_true', help='Extract complete products')
+    parser.add_argument('--keep-zip', action='store_true',
+                       help='Keep products zipped and read bands in place through /vsizip/')
     
     args = parser.parse_args()
     
     # Initialize downloader
-    downloader = Sentinel2Downloader(args.username, args.password)
+    catalog_path = None
+    if not args.no_catalog:
+        os.makedirs(args.download_dir, exist_ok=True)
+        catalog_path = args.catalog or os.path.join(args.download_dir, CATALOG_FILE)
+    downloader = Sentinel2Downloader(args.username, args.password, args.api_url, catalog_path)
     
     # Search for images
     products = downloader.search_images(
@@ -157,16 +784,22 @@ def main():
         print("No images found for the specified criteria")
         return
     
-    # Download images
-    downloader.download_images(products, args.download_dir)
+    bands = None if args.all_bands else sorted(set(args.bands) | (set(RGB_BANDS) if args.create_rgb else set()))
     
-    # Create RGB composites if requested
-    if args.create_rgb:
-        for product_id, product_info in products.items():
-            safe_dir = os.path.join(args.download_dir, product_info['title'])
-            if os.path.exists(safe_dir):
-                rgb_path = os.path.join(args.download_dir, f"{product_info['title']}_RGB.tif")
-                downloader.create_rgb_composite(safe_dir, rgb_path)
+    if args.create_rgb or args.clip_aoi:
+        # Download and composite (or clip) as a pipeline
+        clipper = None
+        if args.clip_aoi:
+            clipper = AOIClipper(geojson_geometries(read_geojson(args.aoi)), bands=args.bands)
+        downloader.run_pipeline(
+            products, args.download_dir, args.workers, args.composite_workers,
+            bands=bands, keep_zip=args.keep_zip, queue_size=args.queue_size, clipper=clipper
+        )
+    else:
+        # Download images
+        downloader.download_images(
+            products, args.download_dir, args.workers, bands=bands, keep_zip=args.keep_zip
+        )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file